@@ -1,3 +1,101 @@
+import threading
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:  # only decode_many needs NumPy
+    np = None
+
+_DIGIT_CHARS = "0123456789"
+_REVERSED_BYTES = bytes(int(format(i, "08b")[::-1], 2) for i in range(256))
+
+
+def _build_module_table(
+    code: dict,
+    first: str,
+    last: str,
+    parity: int,
+    parity_error: int,
+    edge_error: int,
+    combination_error: int,
+) -> tuple:
+    """Map every 7-bit module value to its digit, or to -status if invalid.
+
+    The status is the one validate_barcode would report for that module:
+    parity is checked first, then the start/end bits, then the code table.
+    """
+    table = []
+    for value in range(128):
+        bits = format(value, "07b")
+        if bits.count("1") % 2 != parity:
+            table.append(-parity_error)
+        elif bits[0] != first or bits[-1] != last:
+            table.append(-edge_error)
+        elif bits not in code:
+            table.append(-combination_error)
+        else:
+            table.append(int(code[bits]))
+    return tuple(table)
+
+
+class DecodeCache:
+    """
+    Bounded LRU cache of raw scan -> decode result for BarcodeProcessor.
+    Keys are raw binary strings or packed integers. All access goes through
+    a lock, so one cache can be shared by the processors of many lanes.
+    """
+
+    def __init__(self, capacity: int = 4096):
+        if capacity <= 0:
+            raise ValueError("Cache capacity must be positive")
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached result for key, or None."""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return result
+
+    def put(self, key, result):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
 class BarcodeProcessor:
     L_CODE = {
         "0001101": "0",
@@ -27,8 +125,73 @@ class BarcodeProcessor:
     L_DECODE = {bits: digit for bits, digit in L_CODE.items()}
     R_DECODE = {bits: digit for bits, digit in R_CODE.items()}
 
-    def __init__(self):
-        pass
+    # decode status codes, ordered the same way validate_barcode runs its
+    # checks so the smallest failing code is the error that would be raised
+    OK = 0
+    WRONG_LENGTH = 1
+    WRONG_LEFT_GUARD = 2
+    WRONG_CENTER_GUARD = 3
+    WRONG_RIGHT_GUARD = 4
+    WRONG_LEFT_PARITY = 5
+    WRONG_LEFT_EDGE = 6
+    WRONG_RIGHT_PARITY = 7
+    WRONG_RIGHT_EDGE = 8
+    WRONG_COMBINATION = 9
+    CHECK_FAILED = 10
+
+    STATUS_MESSAGES = {
+        WRONG_LENGTH: "Wrong length",
+        WRONG_LEFT_GUARD: "Wrong LEFT guard",
+        WRONG_CENTER_GUARD: "Wrong CENTER guard",
+        WRONG_RIGHT_GUARD: "Wrong RIGHT guard",
+        WRONG_LEFT_PARITY: "Wrong number of ones in LEFT module",
+        WRONG_LEFT_EDGE: "Wrong start or end in LEFT module",
+        WRONG_RIGHT_PARITY: "Wrong number of ones in RIGHT module",
+        WRONG_RIGHT_EDGE: "Wrong start or end in RIGHT module",
+        WRONG_COMBINATION: "Wrong binary combination",
+        CHECK_FAILED: "Security check failed",
+    }
+
+    # scan orientations reported by decode_oriented
+    FORWARD = "forward"
+    REVERSED = "reversed"
+    HINT = "hint"
+
+    # short names for counters and reports
+    STATUS_NAMES = {
+        WRONG_LENGTH: "wrong_length",
+        WRONG_LEFT_GUARD: "wrong_left_guard",
+        WRONG_CENTER_GUARD: "wrong_center_guard",
+        WRONG_RIGHT_GUARD: "wrong_right_guard",
+        WRONG_LEFT_PARITY: "wrong_left_parity",
+        WRONG_LEFT_EDGE: "wrong_left_edge",
+        WRONG_RIGHT_PARITY: "wrong_right_parity",
+        WRONG_RIGHT_EDGE: "wrong_right_edge",
+        WRONG_COMBINATION: "wrong_combination",
+        CHECK_FAILED: "check_failed",
+    }
+    _MESSAGE_STATUSES = {
+        message: status for status, message in STATUS_MESSAGES.items()
+    }
+
+    # bit offsets of the six LEFT / RIGHT modules inside the 95-bit integer
+    LEFT_SHIFTS = tuple(85 - 7 * i for i in range(6))
+    RIGHT_SHIFTS = tuple(38 - 7 * i for i in range(6))
+
+    L_TABLE = _build_module_table(
+        L_CODE, "0", "1", 1, WRONG_LEFT_PARITY, WRONG_LEFT_EDGE,
+        WRONG_COMBINATION,
+    )
+    R_TABLE = _build_module_table(
+        R_CODE, "1", "0", 0, WRONG_RIGHT_PARITY, WRONG_RIGHT_EDGE,
+        WRONG_COMBINATION,
+    )
+
+    PARITY = tuple(bin(value).count("1") % 2 for value in range(128))
+
+    def __init__(self, cache: DecodeCache | None = None):
+        # optional raw scan -> decode result cache, may be shared by lanes
+        self.cache = cache
 
     def _validate_length(self, binary_barcode: str):
         if len(binary_barcode) != 95:
@@ -85,49 +248,331 @@ class BarcodeProcessor:
 
         return True
 
+    def decode_status(self, binary_barcode: str, check: bool = False) -> tuple:
+        """Decode a 95-bit barcode without raising.
+
+        Guards, module parity/edges and the module lookup are all checked in
+        a single pass over the precomputed L_TABLE / R_TABLE.
+        Returns (status, numeric_barcode); numeric_barcode is None unless
+        status is OK. The status is the check validate_barcode or
+        convert_to_12_digits would have failed first. With check=True a
+        decoded barcode with a bad check digit gives CHECK_FAILED.
+        """
+        status, numeric_barcode = self._decode_status(binary_barcode)
+        if check and not status and not self.check_digit_ok(numeric_barcode):
+            return self.CHECK_FAILED, None
+        return status, numeric_barcode
+
+    def _decode_status(self, binary_barcode: str) -> tuple:
+        status = self._structure_status(binary_barcode)
+        if status:
+            return status, None
+        return self.decode_bits(int(binary_barcode, 2))
+
+    def _structure_status(self, binary_barcode: str) -> int:
+        """Check length, guards and symbols; the checks that do not depend
+        on which way round the barcode was scanned."""
+        if len(binary_barcode) != 95:
+            return self.WRONG_LENGTH
+        if not binary_barcode.startswith("101"):
+            return self.WRONG_LEFT_GUARD
+        if binary_barcode[45:50] != "01010":
+            return self.WRONG_CENTER_GUARD
+        if not binary_barcode.endswith("101"):
+            return self.WRONG_RIGHT_GUARD
+        # int() also accepts "_" and surrounding whitespace, so make sure
+        # every symbol is a bar or a space before converting
+        if binary_barcode.count("0") + binary_barcode.count("1") != 95:
+            return self._symbol_status(binary_barcode)
+        return self.OK
+
+    def _symbol_status(self, binary_barcode: str) -> int:
+        """Status of a row with symbols other than bars and spaces: the
+        module check it fails first, else WRONG_COMBINATION since no
+        module pattern matches it."""
+        try:
+            self._validate_modules(binary_barcode, module="LEFT")
+            self._validate_modules(binary_barcode, module="RIGHT")
+        except ValueError as e:
+            return self._MESSAGE_STATUSES[str(e)]
+        return self.WRONG_COMBINATION
+
+    def _packed_structure_status(self, bits: int) -> int:
+        if bits >> 95:
+            # the row was not 95 bars/spaces; pack_barcode kept its status
+            return bits & 0xFF
+        if bits >> 92 != 0b101:
+            return self.WRONG_LEFT_GUARD
+        if (bits >> 45) & 0b11111 != 0b01010:
+            return self.WRONG_CENTER_GUARD
+        if bits & 0b111 != 0b101:
+            return self.WRONG_RIGHT_GUARD
+        return self.OK
+
+    def decode_bits(self, bits: int) -> tuple:
+        """Decode the modules of a 95-bit barcode held as an integer.
+
+        The guards are assumed to have been checked already.
+        Returns (status, numeric_barcode) like decode_status.
+        """
+        l_table = self.L_TABLE
+        r_table = self.R_TABLE
+        status = 0
+        digits = []
+        for shift in self.LEFT_SHIFTS:
+            d = l_table[(bits >> shift) & 0x7F]
+            if d < 0 and (not status or -d < status):
+                status = -d
+            digits.append(d)
+        for shift in self.RIGHT_SHIFTS:
+            d = r_table[(bits >> shift) & 0x7F]
+            if d < 0 and (not status or -d < status):
+                status = -d
+            digits.append(d)
+        if status:
+            return status, None
+        return self.OK, "".join([_DIGIT_CHARS[d] for d in digits])
+
+    def decode_packed(self, bits: int, check: bool = False) -> tuple:
+        """Decode a barcode packed into an integer by scanfile.pack_barcode.
+
+        Returns (status, numeric_barcode) like decode_status.
+        """
+        status = self._packed_structure_status(bits)
+        if status:
+            return status, None
+        status, numeric_barcode = self.decode_bits(bits)
+        if check and not status and not self.check_digit_ok(numeric_barcode):
+            return self.CHECK_FAILED, None
+        return status, numeric_barcode
+
+    def orientation(self, bits: int):
+        """Work out which way round a guard-checked barcode was scanned.
+
+        The first LEFT module has odd parity and the last RIGHT module even
+        parity, so a reversed scan shows even parity first and odd last.
+        Returns FORWARD or REVERSED, or None if the two disagree (such a
+        barcode cannot be decoded either way round).
+        """
+        first = self.PARITY[(bits >> 85) & 0x7F]
+        last = self.PARITY[(bits >> 3) & 0x7F]
+        if first and not last:
+            return self.FORWARD
+        if last and not first:
+            return self.REVERSED
+        return None
+
+    def decode_oriented(
+        self, binary_barcode: str, hint: str = "forward", check: bool = False
+    ) -> tuple:
+        """Decode a barcode exactly once, in the direction it was scanned.
+
+        Returns (status, numeric_barcode, orientation). orientation is
+        FORWARD or REVERSED as detected, HINT when detection was ambiguous
+        and the hint direction was decoded, or None if the barcode was
+        rejected before its orientation could be looked at. With
+        check=True a bad check digit gives CHECK_FAILED. Results are kept
+        in self.cache when the processor has one.
+        """
+        return self._decode_cached(binary_barcode, False, hint, check)
+
+    def decode_packed_oriented(
+        self, bits: int, hint: str = "forward", check: bool = False
+    ) -> tuple:
+        """Packed counterpart of decode_oriented."""
+        return self._decode_cached(bits, True, hint, check)
+
+    def _decode_cached(self, scan, packed: bool, hint: str, check: bool):
+        cache = self.cache
+        result = None if cache is None else cache.get(scan)
+        if result is None:
+            if packed:
+                status = self._packed_structure_status(scan)
+            else:
+                status = self._structure_status(scan)
+            if status:
+                result = (status, None, None)
+            else:
+                bits = scan if packed else int(scan, 2)
+                result = self._decode_oriented_bits(bits, hint)
+            # a hinted result depends on the lane's hint, not just the scan
+            if cache is not None and result[2] != self.HINT:
+                cache.put(scan, result)
+        if result[0] == self.CHECK_FAILED:
+            if check:
+                return self.CHECK_FAILED, None, result[2]
+            return self.OK, result[1], result[2]
+        return result
+
+    def _decode_oriented_bits(self, bits: int, hint: str) -> tuple:
+        """Decode guard-checked bits in their detected direction. A bad
+        check digit is reported as CHECK_FAILED with the number kept."""
+        orientation = self.orientation(bits)
+        if orientation is None:
+            direction, orientation = hint, self.HINT
+        else:
+            direction = orientation
+        if direction == self.REVERSED:
+            # guards read the same both ways, so only the modules move
+            bits = self.invert_packed(bits)
+        status, numeric_barcode = self.decode_bits(bits)
+        if not status and not self.check_digit_ok(numeric_barcode):
+            status = self.CHECK_FAILED
+        return status, numeric_barcode, orientation
+
+    def decode(self, binary_barcode: str):
+        """Return the 12-digit barcode, or None if it cannot be decoded."""
+        return self.decode_status(binary_barcode)[1]
+
+    def decode_many(self, binary_barcodes, check: bool = True) -> tuple:
+        """Decode a block of binary barcodes at once with NumPy.
+
+        Returns (numeric_barcodes, statuses), two lists with one entry per
+        row that match decode_status(row, check) row for row.
+        """
+        if np is None:
+            raise ImportError("decode_many requires numpy")
+        rows = list(binary_barcodes)
+        statuses = np.zeros(len(rows), dtype=np.int8)
+        full = np.array([len(r) == 95 for r in rows], dtype=bool)
+        statuses[~full] = self.WRONG_LENGTH
+        kept = [r for r in rows if len(r) == 95]
+        numeric_barcodes = [None] * len(rows)
+        if kept:
+            # non-ASCII symbols become "?" so every row stays 95 bytes
+            symbols = np.frombuffer(
+                "".join(kept).encode("ascii", "replace"), dtype=np.uint8
+            ).reshape(-1, 95)
+            kept_statuses, digits = self.decode_symbols(symbols, check)
+            statuses[full] = kept_statuses
+            codes = self._digits_to_codes(digits, kept_statuses)
+            for i, code in zip(np.flatnonzero(full).tolist(), codes):
+                numeric_barcodes[i] = code
+        return numeric_barcodes, statuses.tolist()
+
+    def decode_symbols(self, symbols, check: bool = True) -> tuple:
+        """Decode an (n, 95) uint8 array of ASCII "0"/"1" symbols.
+
+        Returns (statuses, digits): the status of every row, following the
+        order of decode_status, and the (n, 12) digit array.
+        """
+        statuses = np.zeros(symbols.shape[0], dtype=np.int8)
+
+        def reject(bad, status):
+            statuses[:] = np.where((statuses == 0) & bad, status, statuses)
+
+        reject(
+            (symbols[:, :3] != _GUARD_LR).any(axis=1), self.WRONG_LEFT_GUARD
+        )
+        reject(
+            (symbols[:, 45:50] != _GUARD_CENTER).any(axis=1),
+            self.WRONG_CENTER_GUARD,
+        )
+        reject(
+            (symbols[:, 92:] != _GUARD_LR).any(axis=1), self.WRONG_RIGHT_GUARD
+        )
+        bits = symbols - ord("0")
+        not_binary = (bits > 1).any(axis=1)
+        if not_binary.any():
+            # the module checks of _symbol_status, in the same order
+            ones = symbols == ord("1")
+            for start, odd, first, last, parity, edge in (
+                (3, 1, "0", "1", self.WRONG_LEFT_PARITY,
+                 self.WRONG_LEFT_EDGE),
+                (50, 0, "1", "0", self.WRONG_RIGHT_PARITY,
+                 self.WRONG_RIGHT_EDGE),
+            ):
+                modules = symbols[:, start : start + 42].reshape(-1, 6, 7)
+                count = ones[:, start : start + 42].reshape(-1, 6, 7)
+                bad_parity = (count.sum(axis=2) % 2 != odd).any(axis=1)
+                bad_edge = (
+                    (modules[:, :, 0] != ord(first))
+                    | (modules[:, :, 6] != ord(last))
+                ).any(axis=1)
+                reject(not_binary & bad_parity, parity)
+                reject(not_binary & bad_edge, edge)
+        reject(not_binary, self.WRONG_COMBINATION)
+        bits[not_binary] = 0
+
+        digits = self.decode_module_bits(bits)
+        module_status = np.where(digits < 0, -digits, 127).min(axis=1)
+        reject(module_status != 127, module_status)
+        if check:
+            total = digits[:, :11] @ _CHECK_WEIGHTS
+            check_ok = (10 - total % 10) % 10 == digits[:, 11]
+            reject(~check_ok, self.CHECK_FAILED)
+        return statuses, digits
+
+    def decode_module_bits(self, bits):
+        """Look up the twelve modules of an (n, 95) 0/1 array.
+
+        Returns an (n, 12) array of digits, or -status for bad modules.
+        """
+        left = bits[:, 3:45].reshape(-1, 6, 7) @ _MODULE_WEIGHTS
+        right = bits[:, 50:92].reshape(-1, 6, 7) @ _MODULE_WEIGHTS
+        return np.concatenate(
+            (_L_TABLE_ARRAY[left], _R_TABLE_ARRAY[right]), axis=1
+        )
+
+    def _digits_to_codes(self, digits, statuses) -> list:
+        ok = statuses == self.OK
+        text = (digits[ok] + ord("0")).astype(np.uint8).tobytes()
+        text = text.decode("ascii")
+        result = [None] * len(statuses)
+        for j, i in enumerate(np.flatnonzero(ok).tolist()):
+            result[i] = text[12 * j : 12 * (j + 1)]
+        return result
+
+    def check_digit_ok(self, numeric_barcode: str) -> bool:
+        """Return whether the last digit is the modulo-10 check digit."""
+        if (
+            len(numeric_barcode) != 12
+            or not numeric_barcode.isascii()
+            or not numeric_barcode.isdigit()
+        ):
+            return False
+        odd_sum = sum(map(int, numeric_barcode[0:11:2]))
+        even_sum = sum(map(int, numeric_barcode[1:11:2]))
+        check_digit = (10 - ((odd_sum * 3 + even_sum) % 10)) % 10
+        return check_digit == int(numeric_barcode[11])
+
     def validate_barcode(self, binary_barcode: str):
-        self._validate_length(binary_barcode)
-        self._validate_left_guard(binary_barcode)
-        self._validate_center_guard(binary_barcode)
-        self._validate_right_guard(binary_barcode)
-        self._validate_modules(binary_barcode, module="LEFT")
-        self._validate_modules(binary_barcode, module="RIGHT")
+        status, _ = self.decode_status(binary_barcode)
+        # an unknown module is only reported by convert_to_12_digits
+        if status and status != self.WRONG_COMBINATION:
+            raise ValueError(self.STATUS_MESSAGES[status])
         return True
 
     def convert_to_12_digits(self, binary_barcode: str):
-        self.validate_barcode(binary_barcode)
-        left = self._get_left_modules(binary_barcode)
-        right = self._get_right_modules(binary_barcode)
-
-        digits = []
-        for m in left:
-            if m not in self.L_DECODE:
-                raise ValueError("Wrong binary combination")
-            digits.append(self.L_DECODE[m])
-        for m in right:
-            if m not in self.R_DECODE:
-                raise ValueError("Wrong binary combination")
-            digits.append(self.R_DECODE[m])
-
-        return "".join(digits)
+        status, numeric_barcode = self.decode_status(binary_barcode)
+        if status:
+            raise ValueError(self.STATUS_MESSAGES[status])
+        return numeric_barcode
 
     def modulo_check(self, numeric_barcode: str):
-        if len(numeric_barcode) != 12 or not numeric_barcode.isdigit():
-            raise ValueError("Security check failed")
-
-        odd_sum = sum(int(numeric_barcode[i]) for i in range(0, 11, 2))
-        even_sum = sum(int(numeric_barcode[i]) for i in range(1, 11, 2))
-        total = odd_sum * 3 + even_sum
-
-        check_digit = (10 - (total % 10)) % 10
-        if check_digit != int(numeric_barcode[-1]):
-            raise ValueError("Security check failed")
-
+        if not self.check_digit_ok(numeric_barcode):
+            raise ValueError(self.STATUS_MESSAGES[self.CHECK_FAILED])
         return True
 
     def invert_barcode(self, binary_barcode: str):
         return binary_barcode[::-1]
 
+    def invert_packed(self, bits: int) -> int:
+        """Packed counterpart of invert_barcode: reverse the 95 bits."""
+        if bits >> 95:
+            return bits
+        reversed_bytes = bits.to_bytes(12, "little").translate(_REVERSED_BYTES)
+        return int.from_bytes(reversed_bytes, "big") >> 1
+
+
+if np is not None:
+    _L_TABLE_ARRAY = np.array(BarcodeProcessor.L_TABLE, dtype=np.int8)
+    _R_TABLE_ARRAY = np.array(BarcodeProcessor.R_TABLE, dtype=np.int8)
+    _MODULE_WEIGHTS = 1 << np.arange(6, -1, -1)
+    _CHECK_WEIGHTS = np.array([3, 1] * 5 + [3])
+    _GUARD_LR = np.frombuffer(b"101", dtype=np.uint8)
+    _GUARD_CENTER = np.frombuffer(b"01010", dtype=np.uint8)
+
 
 def barcode_doctests():
     """
@@ -182,6 +627,94 @@ def barcode_doctests():
     >>> all(checks)
     True
 
+    >>> scanner.decode_status(valid_binary) == (scanner.OK, valid_numeric)
+    True
+    >>> scanner.decode(valid_binary[::-1]) is None
+    True
+    >>> status, _ = scanner.decode_status(valid_binary[::-1])
+    >>> status == scanner.WRONG_LEFT_PARITY
+    True
+    >>> scanner.decode_status('101')
+    (1, None)
+    >>> scanner.STATUS_MESSAGES[scanner.decode_status('0' * 95)[0]]
+    'Wrong LEFT guard'
+    >>> scanner.L_TABLE[int('0001101', 2)], scanner.R_TABLE[int('1110100', 2)]
+    (0, 9)
+    >>> scanner.L_TABLE[int('1110010', 2)] < 0
+    True
+    >>> scanner.check_digit_ok(valid_numeric)
+    True
+    >>> scanner.check_digit_ok(invalid_numeric)
+    False
+    >>> scanner.convert_to_12_digits(valid_binary[::-1])
+    Traceback (most recent call last):
+    ...
+    ValueError: Wrong number of ones in LEFT module
+
+    >>> with open('cart-data/test_scan_binary.txt', 'r') as f:
+    ...     rows = [line.strip() for line in f]
+    >>> codes, statuses = scanner.decode_many(rows)
+    >>> expected = [scanner.decode_status(row, check=True) for row in rows]
+    >>> list(zip(statuses, codes)) == expected
+    True
+    >>> scanner.decode_many(['1', valid_binary, valid_binary[::-1]])
+    ([None, '252109613999', None], [1, 0, 5])
+    >>> scanner.decode_many([barcode_digits2binary(invalid_numeric)])
+    ([None], [10])
+
+    >>> bits = int(valid_binary, 2)
+    >>> scanner.decode_packed(bits)
+    (0, '252109613999')
+    >>> scanner.decode_packed(scanner.invert_packed(bits))[0]
+    5
+    >>> scanner.invert_packed(bits) == int(valid_binary[::-1], 2)
+    True
+
+    >>> scanner.decode_oriented(valid_binary)
+    (0, '252109613999', 'forward')
+    >>> scanner.decode_oriented(valid_binary[::-1])
+    (0, '252109613999', 'reversed')
+    >>> scanner.decode_oriented(valid_binary[:-1])
+    (1, None, None)
+    >>> ambiguous = valid_binary[:3] + '1110010' + valid_binary[10:]
+    >>> scanner.orientation(int(ambiguous, 2)) is None
+    True
+    >>> scanner.decode_oriented(ambiguous, hint='reversed')[2]
+    'hint'
+
+    >>> scanner.decode_oriented(invalid_binary)
+    (0, '036000291439', 'forward')
+    >>> scanner.decode_oriented(invalid_binary, check=True)
+    (10, None, 'forward')
+
+    >>> smudged = valid_binary[:10] + 'x' + valid_binary[11:]
+    >>> scanner.validate_barcode(smudged)
+    Traceback (most recent call last):
+    ...
+    ValueError: Wrong start or end in LEFT module
+    >>> scanner.decode_status(smudged), scanner.decode_many([smudged])
+    ((6, None), ([None], [6]))
+
+    >>> cache = DecodeCache(capacity=2)
+    >>> cached = BarcodeProcessor(cache)
+    >>> cached.decode_oriented(valid_binary, check=True)
+    (0, '252109613999', 'forward')
+    >>> cached.decode_oriented(valid_binary, check=True)
+    (0, '252109613999', 'forward')
+    >>> cached.decode_oriented(valid_binary[::-1])
+    (0, '252109613999', 'reversed')
+    >>> cached.decode_oriented('1')
+    (1, None, None)
+    >>> stats = cache.stats()
+    >>> stats['hits'], stats['misses'], stats['evictions'], stats['size']
+    (1, 3, 1, 2)
+    >>> cached.decode_oriented(ambiguous)[2], len(cache)
+    ('hint', 2)
+    >>> DecodeCache(capacity=0)
+    Traceback (most recent call last):
+    ...
+    ValueError: Cache capacity must be positive
+
     >>> bp = BarcodeProcessor()
     >>> bp.invert_barcode("10110")
     '01101'
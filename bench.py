@@ -0,0 +1,344 @@
+# bench.py
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+
+from barcode import BarcodeProcessor
+from cart import ShoppingCart
+from database import ProductDatabase, MemberDatabase, CouponDatabase
+from pos import POSSystem
+from store_backend import StoreBackend
+from workload import WorkloadGenerator
+
+
+# fixture sizes; scans is both the scan file length and the cart size
+SCALES = {
+    "small": dict(products=100, members=50, coupons=20, scans=50),
+    "medium": dict(products=10000, members=5000, coupons=200, scans=500),
+    "large": dict(
+        products=100000, members=50000, coupons=2000, scans=5000
+    ),
+}
+
+# name -> function(fixture) returning (callable, operations per call)
+BENCHMARKS = {}
+
+
+def benchmark(name: str):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+class Fixture:
+    """
+    Store files and scans for one scale, generated with a fixed seed in a
+    temporary directory so every run measures the same data.
+    """
+
+    def __init__(self, scale: str, directory: str):
+        size = SCALES[scale]
+        self.scale = scale
+        self.directory = directory
+        self.generator = WorkloadGenerator(
+            seed=0,
+            n_products=size["products"],
+            n_members=size["members"],
+            n_coupons=size["coupons"],
+            max_stock=10**6,
+        )
+        self.paths = self.generator.write_store(directory)
+        self.scan_path = os.path.join(directory, "cart.txt")
+        self.generator.write_cart(
+            self.scan_path, size["scans"], distinct=size["scans"]
+        )
+        with open(self.scan_path) as f:
+            self.rows = [line.strip() for line in f]
+        self.codes = [
+            self.generator.barcode("product", i % size["products"])
+            for i in range(size["scans"])
+        ]
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+
+@benchmark("barcode.convert_to_12_digits")
+def _convert(fixture):
+    bp = BarcodeProcessor()
+    rows = fixture.rows
+
+    def run():
+        for row in rows:
+            bp.convert_to_12_digits(row)
+
+    return run, len(rows)
+
+
+@benchmark("barcode.modulo_check")
+def _modulo(fixture):
+    bp = BarcodeProcessor()
+    codes = fixture.codes
+
+    def run():
+        for code in codes:
+            bp.modulo_check(code)
+
+    return run, len(codes)
+
+
+@benchmark("barcode.invert_barcode")
+def _invert(fixture):
+    bp = BarcodeProcessor()
+    rows = fixture.rows
+
+    def run():
+        for row in rows:
+            bp.invert_barcode(row)
+
+    return run, len(rows)
+
+
+@benchmark("database.load_inventory")
+def _load_inventory(fixture):
+    path = fixture.paths["inventory"]
+    return (lambda: ProductDatabase(path)), fixture.generator.n_products
+
+
+@benchmark("database.load_memberships")
+def _load_memberships(fixture):
+    path = fixture.paths["memberships"]
+    return (lambda: MemberDatabase(path)), fixture.generator.n_members
+
+
+@benchmark("database.load_coupons")
+def _load_coupons(fixture):
+    path = fixture.paths["coupons"]
+    return (lambda: CouponDatabase(path)), fixture.generator.n_coupons
+
+
+@benchmark("database.save_inventory")
+def _save_inventory(fixture):
+    db = ProductDatabase(fixture.paths["inventory"])
+    out = fixture.path("saved_inventory.csv")
+    return (lambda: db.save_inventory(out)), fixture.generator.n_products
+
+
+@benchmark("database.save_memberships")
+def _save_memberships(fixture):
+    db = MemberDatabase(fixture.paths["memberships"])
+    out = fixture.path("saved_memberships.csv")
+    return (lambda: db.save_memberships(out)), fixture.generator.n_members
+
+
+@benchmark("cart.calculate_total")
+def _calculate_total(fixture):
+    products = ProductDatabase(fixture.paths["inventory"])
+    members = MemberDatabase(fixture.paths["memberships"])
+    coupons = CouponDatabase(fixture.paths["coupons"])
+    cart = ShoppingCart()
+    for code in fixture.codes:
+        cart.add_item(products.get_product(code))
+    cart.add_membership(next(iter(members.members.values())))
+    cart.add_coupon(next(iter(coupons.coupons.values())))
+    return cart.calculate_total, len(fixture.codes)
+
+
+@benchmark("pos.process_barcodes+checkout")
+def _end_to_end(fixture):
+    pos = POSSystem(
+        fixture.paths["inventory"],
+        fixture.paths["memberships"],
+        fixture.paths["coupons"],
+    )
+
+    def run():
+        pos.process_barcodes(fixture.scan_path)
+        pos.checkout()
+        pos.new_cart()
+
+    return run, len(fixture.rows)
+
+
+@benchmark("store.startup+first_cash_sale")
+def _first_cash_sale(fixture):
+    # a lane from start-up to its first member-less, coupon-less sale
+    paths = fixture.paths
+    code = fixture.codes[0]
+
+    def run():
+        store = StoreBackend(
+            paths["inventory"], paths["memberships"], paths["coupons"]
+        )
+        pos = POSSystem(store=store)
+        pos.add_numeric_barcode(code)
+        pos.checkout()
+
+    return run, 1
+
+
+def measure(fn, repeat: int = 5, min_time: float = 0.2) -> tuple:
+    """Time fn: calibrate a loop count that takes about min_time / repeat,
+    then time repeat loops. Returns (best, median) seconds per call."""
+    timer = timeit.Timer(fn)
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time / repeat:
+            break
+        number *= 2
+    times = sorted(t / number for t in timer.repeat(repeat, number))
+    return times[0], times[len(times) // 2]
+
+
+def run(
+    scales=("small", "medium"),
+    names=None,
+    repeat: int = 5,
+    min_time: float = 0.2,
+) -> dict:
+    """Run the benchmarks (all, or those whose name contains one of
+    names) at each scale. Returns the results as a JSON-ready dict."""
+    results = []
+    # checkout saves to the class-level paths; keep them out of db-data
+    save_paths = ProductDatabase.SAVE_PATH, MemberDatabase.SAVE_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        ProductDatabase.SAVE_PATH = os.path.join(tmp, "updated_inv.csv")
+        MemberDatabase.SAVE_PATH = os.path.join(tmp, "updated_mem.csv")
+        try:
+            for scale in scales:
+                fixture = Fixture(scale, os.path.join(tmp, scale))
+                for name, setup in BENCHMARKS.items():
+                    if names and not any(n in name for n in names):
+                        continue
+                    fn, ops = setup(fixture)
+                    best, median = measure(fn, repeat, min_time)
+                    results.append(
+                        {
+                            "name": name,
+                            "scale": scale,
+                            "ops": ops,
+                            "best": best,
+                            "median": median,
+                            "per_op": best / ops,
+                        }
+                    )
+        finally:
+            ProductDatabase.SAVE_PATH, MemberDatabase.SAVE_PATH = save_paths
+    return {
+        "meta": {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(old: dict, new: dict, threshold: float = 0.1) -> list:
+    """Pair the results of two runs by name and scale. Returns rows of
+    (name, scale, old best, new best, ratio, regressed), where regressed
+    means the new run is more than threshold slower."""
+    before = {(r["name"], r["scale"]): r["best"] for r in old["results"]}
+    rows = []
+    for r in new["results"]:
+        key = (r["name"], r["scale"])
+        if key not in before:
+            continue
+        ratio = r["best"] / before[key]
+        regressed = ratio > 1 + threshold
+        rows.append(key + (before[key], r["best"], ratio, regressed))
+    return rows
+
+
+def format_comparison(rows: list) -> str:
+    lines = [
+        f"{'benchmark':<36}{'scale':<8}{'old':>11}{'new':>11}{'ratio':>8}"
+    ]
+    for name, scale, old, new, ratio, regressed in rows:
+        lines.append(
+            f"{name:<36}{scale:<8}{old * 1e3:>9.3f}ms{new * 1e3:>9.3f}ms"
+            f"{ratio:>8.2f}" + ("  REGRESSION" if regressed else "")
+        )
+    return "\n".join(lines)
+
+
+def bench_doctests():
+    """Function to run the doctests for the benchmark suite.
+
+    Note that you should run this doctest at the root folder of the project
+    (same level as main.py)
+
+    >>> report = run(scales=('small',), repeat=2, min_time=0.001)
+    >>> sorted({r['name'] for r in report['results']}) == sorted(BENCHMARKS)
+    True
+    >>> all(r['best'] <= r['median'] and r['per_op'] > 0
+    ...     for r in report['results'])
+    True
+    >>> ProductDatabase.SAVE_PATH
+    'db-data/updated_inventory.csv'
+    >>> json.loads(json.dumps(report)) == report
+    True
+
+    >>> old = {'results': [
+    ...     {'name': 'a', 'scale': 'small', 'best': 1.0},
+    ...     {'name': 'b', 'scale': 'small', 'best': 1.0}]}
+    >>> new = {'results': [
+    ...     {'name': 'a', 'scale': 'small', 'best': 1.05},
+    ...     {'name': 'b', 'scale': 'small', 'best': 1.5},
+    ...     {'name': 'c', 'scale': 'small', 'best': 1.0}]}
+    >>> [(row[0], row[-1]) for row in compare(old, new)]
+    [('a', False), ('b', True)]
+    >>> print(format_comparison(compare(old, new)))  # doctest: +ELLIPSIS
+    benchmark ... ratio
+    a ... 1.05
+    b ... 1.50  REGRESSION
+    """
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hot path benchmarks.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run and save as JSON")
+    run_parser.add_argument("--output", default="bench.json")
+    run_parser.add_argument(
+        "--scales", nargs="+", choices=SCALES, default=["small", "medium"]
+    )
+    run_parser.add_argument(
+        "--only", nargs="+", help="benchmarks whose name contains any"
+    )
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--min-time", type=float, default=0.2)
+    compare_parser = commands.add_parser(
+        "compare", help="flag regressions between two runs"
+    )
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        report = run(args.scales, args.only, args.repeat, args.min_time)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        for r in report["results"]:
+            print(
+                f"{r['name']:<36}{r['scale']:<8}"
+                f"{r['best'] * 1e3:>9.3f}ms {r['per_op'] * 1e6:>9.3f}us/op"
+            )
+    else:
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        rows = compare(old, new, args.threshold)
+        print(format_comparison(rows))
+        sys.exit(1 if any(row[-1] for row in rows) else 0)
@@ -1,26 +1,108 @@
 # cart.py
 
+import math
+import sys
+from array import array
+from datetime import datetime
+
 from product import Product
 from member import Member, SilverMember, GoldMember, PlatinumMember
-from coupon import Coupon, FixedDiscountCoupon, PercentDiscountCoupon
+from money import to_cents, scale_cents, points_for_cents
+from coupon import (
+    Coupon,
+    CouponRules,
+    FixedDiscountCoupon,
+    PercentDiscountCoupon,
+)
 
 
-class ShoppingCart:
+# sum() of floats is compensated (Neumaier) from Python 3.12 on
+_COMPENSATED_SUM = sys.version_info >= (3, 12)
+
+
+class _RunningSum:
+    """
+    A running total that equals sum() over the values added so far, bit
+    for bit, for int and float values: it follows sum()'s exact int
+    phase, then its float loop (compensated on 3.12+).
+    """
+
     def __init__(self):
-        self.products: list[Product] = []
+        self.total = 0
+        self.is_float = False
+        self.compensation = 0.0
+
+    def add(self, x):
+        if not self.is_float:
+            self.total = self.total + x
+            self.is_float = type(self.total) is float
+        elif type(x) is float and _COMPENSATED_SUM:
+            total = self.total
+            t = total + x
+            if abs(total) >= abs(x):
+                self.compensation += (total - t) + x
+            else:
+                self.compensation += (x - t) + total
+            self.total = t
+        elif _COMPENSATED_SUM:
+            self.total += float(x)
+        else:
+            self.total += x
+
+    def value(self):
+        c = self.compensation
+        if self.is_float and c and math.isfinite(c):
+            return self.total + c
+        return self.total
+
+
+class ShoppingCart:
+    def __init__(self, now: datetime = None):
+        self._init_items()
         self.membership: Member | None = None
         self.coupons: list[Coupon] = []
+        # coupon validity is decided once, at the cart's clock; without
+        # one, the clock starts at the first coupon, not at cart creation
+        self.coupon_rules = CouponRules(now=now)
+        # subtotal kept up to date as items are added, so a total refresh
+        # costs O(coupons) instead of O(items)
+        self._subtotal = _RunningSum()
+        # bumped whenever the total may have changed, so a display only
+        # refreshes when it differs from the version it last drew
+        self.version = 0
+
+    def _init_items(self):
+        self.products: list[Product] = []
+        # barcode -> units in the cart, kept alongside the scan-order list
+        self.quantities: dict[str, int] = {}
 
     def add_item(self, product: Product):
+        self._store_item(product)
+        self._add_price(product.get_price())
+        self.version += 1
+
+    def _store_item(self, product: Product):
         self.products.append(product)
+        code = product.get_barcode()
+        self.quantities[code] = self.quantities.get(code, 0) + 1
+
+    def _add_price(self, price):
+        self._subtotal.add(price)
+
+    def get_quantity(self, numeric_barcode: str) -> int:
+        """Return how many units of a barcode are in the cart."""
+        return self.quantities.get(numeric_barcode, 0)
 
     def add_membership(self, membership: Member):
         self.membership = membership
+        self.version += 1
 
     def add_coupon(self, coupon: Coupon):
         code = coupon.get_barcode()
         if not any(c.get_barcode() == code for c in self.coupons):
             self.coupons.append(coupon)
+            self.coupon_rules.add(coupon)
+            self.version += 1
 
     def get_items(self):
         return list(self.products)
@@ -32,15 +114,14 @@ class ShoppingCart:
         return list(self.coupons)
 
     def calculate_subtotal(self):
-        return sum(p.get_price() for p in self.products)
+        # same value as sum(p.get_price() for p in self.products)
+        return self._subtotal.value()
 
     def calculate_total(self):
         subtotal = self.calculate_subtotal()
 
         # total coupon deduction
-        coupon_deduction = sum(
-            c.discount_amount(subtotal) for c in self.coupons
-        )
+        coupon_deduction = self.coupon_rules.discount(subtotal)
 
         # membership deduction
         member_deduction = 0.0
@@ -51,6 +132,122 @@ class ShoppingCart:
         # guard against negative total
         return total if total >= 0 else 0.0
 
+    def calculate_points(self, total: float):
+        """Points the membership earns on a checkout total (0 without a
+        membership)."""
+        if self.membership is None:
+            return 0
+        # points multiplier is per-dollar
+        return total * self.membership.get_points_multiplier()
+
+
+class CompactShoppingCart(ShoppingCart):
+    """
+    ShoppingCart for very large carts. Each distinct product is stored
+    once, as a line; per-line quantities and the scan order (one line
+    index per unit) are kept in compact unsigned int arrays instead of a
+    list holding one Product reference per unit.
+
+    Use iter_items() and lines() to walk the cart without copying it;
+    get_items() and products still expand to the per-unit list.
+    """
+
+    def _init_items(self):
+        # one entry per distinct product, in first-scan order
+        self.line_products: list[Product] = []
+        self.line_quantities = array("I")
+        # line index of every unit, in scan order
+        self.scan_order = array("I")
+        self._line_of: dict[str, int] = {}
+
+    def _store_item(self, product: Product):
+        code = product.get_barcode()
+        line = self._line_of.get(code)
+        if line is None:
+            line = self._line_of[code] = len(self.line_products)
+            self.line_products.append(product)
+            self.line_quantities.append(0)
+        self.line_quantities[line] += 1
+        self.scan_order.append(line)
+
+    def get_quantity(self, numeric_barcode: str) -> int:
+        line = self._line_of.get(numeric_barcode)
+        return 0 if line is None else self.line_quantities[line]
+
+    @property
+    def quantities(self) -> dict:
+        """barcode -> units in the cart, built on request."""
+        return {
+            product.get_barcode(): quantity
+            for product, quantity in zip(
+                self.line_products, self.line_quantities
+            )
+        }
+
+    @property
+    def products(self) -> list:
+        """One Product per unit in scan order, built on request."""
+        return self.get_items()
+
+    def iter_items(self):
+        """Yield one Product per unit in scan order, without a copy."""
+        lines = self.line_products
+        for line in self.scan_order:
+            yield lines[line]
+
+    def lines(self):
+        """Yield (product, quantity) per distinct product, in the order
+        each was first scanned."""
+        return zip(self.line_products, self.line_quantities)
+
+    def get_items(self):
+        lines = self.line_products
+        return [lines[line] for line in self.scan_order]
+
+
+class CentsShoppingCart(ShoppingCart):
+    """
+    ShoppingCart that prices in integer cents. Item prices are summed as
+    cents; percent coupons and the membership discount are rounded half
+    up to a whole cent, and points are whole points, rounded down. The
+    dollar methods return the exact cent amounts as floats, so they can
+    stand in for a ShoppingCart.
+    """
+
+    def __init__(self, now: datetime = None):
+        super().__init__(now)
+        self.subtotal_cents = 0
+
+    def _add_price(self, price):
+        self.subtotal_cents += to_cents(price)
+
+    def calculate_subtotal_cents(self) -> int:
+        return self.subtotal_cents
+
+    def calculate_total_cents(self) -> int:
+        subtotal = self.subtotal_cents
+        coupon_deduction = self.coupon_rules.discount_cents(subtotal)
+        member_deduction = 0
+        if self.membership is not None:
+            member_deduction = scale_cents(
+                subtotal, self.membership.get_discount_rate()
+            )
+        total = subtotal - coupon_deduction - member_deduction
+        return total if total >= 0 else 0
+
+    def calculate_subtotal(self):
+        return self.subtotal_cents / 100
+
+    def calculate_total(self):
+        return self.calculate_total_cents() / 100
+
+    def calculate_points(self, total: float) -> int:
+        if self.membership is None:
+            return 0
+        return points_for_cents(
+            to_cents(total), self.membership.get_points_multiplier()
+        )
+
 
 def shopping_cart_doctests():
     """Function to run the doctests for the ShoppingCart class.
@@ -81,6 +278,24 @@ def shopping_cart_doctests():
     True
     >>> len(cart.get_items()) == 2
     True
+    >>> cart.get_quantity('random_barcode'), cart.get_quantity('missing')
+    (1, 0)
+    >>> cart.version
+    4
+    >>> cart.add_coupon(fc)
+    >>> cart.version
+    4
+
+    >>> import random
+    >>> rng = random.Random(0)
+    >>> big = ShoppingCart()
+    >>> for i in range(2000):
+    ...     big.add_item(Product(str(i), 'x', rng.randint(19, 9999) / 100, 1))
+    ...     assert big.calculate_subtotal() == sum(
+    ...         p.get_price() for p in big.products)
+    >>> big.add_item(Product('int', 'y', 3, 1))
+    >>> big.calculate_subtotal() == sum(p.get_price() for p in big.products)
+    True
 
     >>> p1 = Product('012345678905', 'Cheddar Cheese', 4.50, 60)
     >>> p2 = Product('027222235225', 'Apple', 1.20, 200)
@@ -99,4 +314,61 @@ def shopping_cart_doctests():
     0.42
     >>> cart.get_membership().return_membership_type()
     'Gold'
+
+    >>> dated = ShoppingCart(now=datetime(2026, 1, 1))
+    >>> dated.add_item(p1)
+    >>> dated.add_coupon(c)
+    >>> dated.calculate_total(), len(dated.coupon_rules.active)
+    (0.0, 1)
+
+    A cart opened before a coupon expires, but scanned after, rejects it.
+
+    >>> import time
+    >>> from datetime import timedelta
+    >>> expiry = datetime.now() + timedelta(seconds=0.05)
+    >>> soon = FixedDiscountCoupon('3', expiry, 0, '', 1)
+    >>> idle = ShoppingCart()
+    >>> time.sleep(0.1)
+    >>> idle.add_item(p1)
+    >>> idle.add_coupon(soon)
+    >>> idle.calculate_total(), len(idle.coupon_rules.expired)
+    (4.5, 1)
+
+    >>> cents = CentsShoppingCart(now=datetime(2026, 1, 1))
+    >>> cents.add_item(p1)
+    >>> cents.add_item(p2)
+    >>> cents.add_membership(m)
+    >>> cents.add_coupon(c)
+    >>> cents.calculate_subtotal_cents(), cents.calculate_total_cents()
+    (570, 41)
+    >>> cents.calculate_total(), cents.calculate_points(0.41)
+    (0.41, 0)
+    >>> for _ in range(10):
+    ...     cents.add_item(Product('x', 'Tenth', 0.1, 10))
+    >>> cents.calculate_subtotal(), cents.calculate_total()
+    (6.7, 1.36)
+    >>> cents.calculate_points(cents.calculate_total())
+    2
+
+    >>> compact = CompactShoppingCart()
+    >>> for product in big.get_items():
+    ...     compact.add_item(product)
+    >>> compact.get_items() == big.get_items() == compact.products
+    True
+    >>> compact.calculate_subtotal() == big.calculate_subtotal()
+    True
+    >>> compact.quantities == big.quantities, compact.version
+    (True, 2001)
+    >>> compact = CompactShoppingCart()
+    >>> for _ in range(3):
+    ...     compact.add_item(p2)
+    ...     compact.add_item(p1)
+    >>> [(p.get_name(), q) for p, q in compact.lines()]
+    [('Apple', 3), ('Cheddar Cheese', 3)]
+    >>> [p.get_name() for p in compact.iter_items()][:3]
+    ['Apple', 'Cheddar Cheese', 'Apple']
+    >>> compact.get_quantity('027222235225'), compact.get_quantity('x')
+    (3, 0)
+    >>> list(compact.scan_order), compact.scan_order.itemsize
+    ([0, 1, 0, 1, 0, 1], 4)
     """
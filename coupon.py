@@ -1,5 +1,12 @@
 from datetime import datetime
 
+from money import to_cents, percent_of_cents
+
+
+# discount types, as written in the coupons CSV
+PERCENT = "percent"
+FIXED = "fixed"
+
 
 class Coupon:
     def __init__(
@@ -14,12 +21,19 @@ class Coupon:
         self.min_purchase = min_purchase
         self.description = description
 
-    def _is_expired(self):
-        return True if datetime.now() > self.expiration_date else False
+    def _is_expired(self, now: datetime = None):
+        if now is None:
+            now = datetime.now()
+        return True if now > self.expiration_date else False
 
     def discount_amount(self, subtotal: float):
         pass
 
+    def rule(self):
+        """Return (discount type, min purchase, value) for CouponRules,
+        or None if the discount has no compiled form."""
+        return None
+
     def get_barcode(self) -> str:
         """Return the 12-digit barcode of the coupon."""
         return self.numeric_barcode
@@ -50,6 +64,9 @@ class PercentDiscountCoupon(Coupon):
         else:
             return 0
 
+    def rule(self):
+        return PERCENT, self.min_purchase, self.percent_value
+
 
 class FixedDiscountCoupon(Coupon):
 
@@ -80,6 +97,91 @@ class FixedDiscountCoupon(Coupon):
         else:
             return 0
 
+    def rule(self):
+        return FIXED, self.min_purchase, self.fixed_value
+
+
+class CouponRules:
+    """
+    The coupons of one transaction, checked against a single clock. Each
+    coupon is sorted into active or expired once, when it is added, and
+    an active one is compiled to a (type, min purchase, value) rule, so
+    discount() only does arithmetic. One CouponRules can price any
+    number of subtotals (e.g. re-pricing many carts) with the same
+    result as summing discount_amount() over the coupons at that time.
+    """
+
+    def __init__(self, coupons=(), now: datetime = None):
+        """
+        Args:
+            coupons: coupons to add straight away.
+            now (datetime): the transaction's clock. If not given, it is
+                datetime.now() when the first coupon is added, so rules
+                made ahead of a transaction don't judge it by a stale
+                clock.
+        """
+        self.now = now
+        self.active: list[Coupon] = []
+        self.expired: list[Coupon] = []
+        self._rules = []
+        # the same rules with amounts in integer cents, for cents carts
+        self._cents_rules = []
+        for coupon in coupons:
+            self.add(coupon)
+
+    def add(self, coupon: Coupon) -> bool:
+        """Add a coupon. Returns whether it is active at self.now."""
+        if self.now is None:
+            self.now = datetime.now()
+        if coupon._is_expired(self.now):
+            self.expired.append(coupon)
+            return False
+        self.active.append(coupon)
+        rule = coupon.rule()
+        if rule is None:
+            # no compiled form: ask the coupon itself every time
+            rule = (None, float("-inf"), coupon)
+            cents_rule = rule
+        else:
+            kind, min_purchase, value = rule
+            if kind == FIXED:
+                value = to_cents(value)
+            cents_rule = (kind, to_cents(min_purchase), value)
+        self._rules.append(rule)
+        self._cents_rules.append(cents_rule)
+        return True
+
+    def discount(self, subtotal: float):
+        """Total coupon deduction for a subtotal."""
+        # expired and below-minimum coupons give 0, which sum() would
+        # add without changing the result, so they are skipped
+        return sum(
+            subtotal * value / 100
+            if kind == PERCENT
+            else (
+                (value if subtotal - value > 0 else subtotal)
+                if kind == FIXED
+                else value.discount_amount(subtotal)
+            )
+            for kind, min_purchase, value in self._rules
+            if subtotal >= min_purchase
+        )
+
+    def discount_cents(self, subtotal: int) -> int:
+        """Total coupon deduction, in cents, for a subtotal in cents.
+        Percent discounts are rounded half up to a whole cent."""
+        return sum(
+            percent_of_cents(subtotal, value)
+            if kind == PERCENT
+            else (
+                (value if subtotal - value > 0 else subtotal)
+                if kind == FIXED
+                else to_cents(value.discount_amount(subtotal / 100))
+            )
+            for kind, min_purchase, value in self._cents_rules
+            if subtotal >= min_purchase
+        )
+
 
 def coupon_doctests():
     """Function to run the doctests for the Coupon class.
@@ -124,6 +226,39 @@ def coupon_doctests():
     20.0
     >>> test_fixed.discount_amount(10.0)
     0
+    >>> test_fixed._is_expired(datetime(2026, 1, 1))
+    True
+
+    >>> now = datetime(2025, 6, 1)
+    >>> expired = FixedDiscountCoupon('1', datetime(2025, 1, 1), 0, 'old', 5.0)
+    >>> rules = CouponRules([test_percent, test_fixed, expired], now)
+    >>> len(rules.active), len(rules.expired)
+    (2, 1)
+    >>> rules.discount(200.0)
+    61.0
+    >>> rules.discount(25.0)
+    28.875
+    >>> rules.discount(10.0)
+    0
+    >>> rules.discount_cents(2500), rules.discount_cents(1999)
+    (2888, 0)
+    >>> import random
+    >>> rng = random.Random(0)
+    >>> coupons = [
+    ...     PercentDiscountCoupon(str(i), datetime(2030, 1, 1),
+    ...                           rng.choice((0, 10, 50)), 'p',
+    ...                           rng.choice((5, 12.5, 20)))
+    ...     if i % 2 else
+    ...     FixedDiscountCoupon(str(i), datetime(2030, 1, 1),
+    ...                         rng.choice((0, 10, 50)), 'f',
+    ...                         rng.choice((1.0, 2.5, 10.0)))
+    ...     for i in range(6)
+    ... ]
+    >>> rules = CouponRules(coupons)
+    >>> subtotals = [rng.randint(0, 20000) / 100 for _ in range(2000)]
+    >>> all(rules.discount(s) == sum(c.discount_amount(s) for c in coupons)
+    ...     for s in subtotals)
+    True
 
 
     """
@@ -2,6 +2,56 @@ from product import Product
 from member import Member, SilverMember, GoldMember, PlatinumMember
 from coupon import Coupon, PercentDiscountCoupon, FixedDiscountCoupon
 from datetime import datetime
+import csv
+import os
+import shutil
+import time
+
+
+# loaders read their CSV in chunks of this many bytes
+CHUNK_SIZE = 1 << 16
+
+
+def _sync(file):
+    """Push a file's contents to disk before it is renamed into place."""
+    file.flush()
+    os.fsync(file.fileno())
+
+
+def copy_csv(source_path: str, path: str):
+    """Write a copy of the CSV at source_path to path, through a
+    temporary file renamed into place like the database saves."""
+    tmp_path = path + ".tmp"
+    shutil.copyfile(source_path, tmp_path)
+    with open(tmp_path, "rb+") as file:
+        _sync(file)
+    os.replace(tmp_path, path)
+
+
+def iter_csv_rows(path: str):
+    """Yield the data rows of a CSV file (header skipped, blank lines
+    dropped) as lists of fields. The file is read CHUNK_SIZE bytes at a
+    time and tokenized by the csv module, so quoted commas are kept and
+    no row outlives its parsing."""
+    with open(path, "r", newline="", buffering=CHUNK_SIZE) as file:
+        reader = csv.reader(file)
+        next(reader, None)
+        for row in reader:
+            if row:
+                yield row
+
+
+def _load_stats(path: str, rows: int, start: float) -> dict:
+    """Throughput of a load that began at start (time.perf_counter)."""
+    seconds = time.perf_counter() - start
+    size = os.path.getsize(path)
+    return {
+        "rows": rows,
+        "bytes": size,
+        "seconds": seconds,
+        "rows_per_second": rows / seconds if seconds else float("inf"),
+        "mb_per_second": size / 1e6 / seconds if seconds else float("inf"),
+    }
 
 
 class ProductDatabase:
@@ -10,16 +60,17 @@ class ProductDatabase:
     def __init__(self, inventory_path: str):
         self.inventory_path = inventory_path
         self.products = {}
-        with open(self.inventory_path, "r") as file:
-            lines = file.readlines()
-            for i in range(1, len(lines)):
-                product_info = lines[i].strip().split(",")
-                self.products[product_info[0]] = Product(
-                    product_info[0],
-                    product_info[1],
-                    float(product_info[2]),
-                    int(float(product_info[3])),
-                )
+        start = time.perf_counter()
+        for product_info in iter_csv_rows(self.inventory_path):
+            self.products[product_info[0]] = Product(
+                product_info[0],
+                product_info[1],
+                float(product_info[2]),
+                int(float(product_info[3])),
+            )
+        self.load_stats = _load_stats(
+            inventory_path, len(self.products), start
+        )
 
     def get_product(self, numeric_barcode: str):
         if numeric_barcode in self.products:
@@ -32,25 +83,43 @@ class ProductDatabase:
         if product is not None:
             product.decrease_quantity(quantity)
 
-    def save_inventory(self):
-        with open(self.inventory_path, "r") as file1:
-            with open(ProductDatabase.SAVE_PATH, "w") as file2:
-                lines = file1.readlines()
-                file2.write("numeric_barcode,name,price,quantity\n")
-                for i in range(1, len(lines)):
-                    barcode = lines[i].strip().split(",")[0]
-                    product = self.get_product(barcode)
-                    if product != None:
-                        file2.write(
-                            str(product.get_barcode())
-                            + ","
-                            + str(product.get_name())
-                            + ","
-                            + str(product.get_price())
-                            + ","
-                            + str(product.get_quantity())
-                            + "\n"
-                        )
+    def decrement_inventory_many(self, quantities: dict):
+        """Decrement many products at once from a barcode -> quantity
+        mapping. Every quantity is checked before any stock changes;
+        unknown barcodes are skipped like in decrement_inventory."""
+        if any(
+            not isinstance(q, int) or q < 0 for q in quantities.values()
+        ):
+            raise ValueError("Quantities must be non-negative integers")
+        products = self.products
+        for numeric_barcode, quantity in quantities.items():
+            product = products.get(numeric_barcode)
+            if product is not None:
+                product.decrease_quantity(quantity)
+
+    def save_inventory(self, path: str = None):
+        """Write the current state to path (ProductDatabase.SAVE_PATH by
+        default), in the row order of the source CSV."""
+        path = path or ProductDatabase.SAVE_PATH
+        # write a temporary file and rename it over the old one, so a
+        # crash mid-save never leaves a half-written file behind
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", newline="") as file2:
+            writer = csv.writer(file2, lineterminator="\n")
+            writer.writerow(["numeric_barcode", "name", "price", "quantity"])
+            for row in iter_csv_rows(self.inventory_path):
+                product = self.get_product(row[0])
+                if product != None:
+                    writer.writerow(
+                        [
+                            product.get_barcode(),
+                            product.get_name(),
+                            product.get_price(),
+                            product.get_quantity(),
+                        ]
+                    )
+            _sync(file2)
+        os.replace(tmp_path, path)
 
 
 class MemberDatabase:
@@ -59,32 +128,30 @@ class MemberDatabase:
     def __init__(self, membership_path: str):
         self.membership_path = membership_path
         self.members = {}
-        with open(self.membership_path, "r") as file:
-            lines = file.readlines()
-            for i in range(1, len(lines)):
-                member_info = lines[i].strip().split(",")
-                member_type = member_info[2]
-                if member_type == "Silver":
-                    self.members[member_info[0]] = SilverMember(
-                        member_info[0],
-                        member_info[1],
-                        int(float(member_info[3]))
-,
-                    )
-                elif member_type == "Gold":
-                    self.members[member_info[0]] = GoldMember(
-                        member_info[0],
-                        member_info[1],
-                        int(float(member_info[3]))
-,
-                    )
-                else:
-                    self.members[member_info[0]] = PlatinumMember(
-                        member_info[0],
-                        member_info[1],
-                        int(float(member_info[3]))
-,
-                    )
+        start = time.perf_counter()
+        for member_info in iter_csv_rows(self.membership_path):
+            member_type = member_info[2]
+            if member_type == "Silver":
+                self.members[member_info[0]] = SilverMember(
+                    member_info[0],
+                    member_info[1],
+                    int(float(member_info[3])),
+                )
+            elif member_type == "Gold":
+                self.members[member_info[0]] = GoldMember(
+                    member_info[0],
+                    member_info[1],
+                    int(float(member_info[3])),
+                )
+            else:
+                self.members[member_info[0]] = PlatinumMember(
+                    member_info[0],
+                    member_info[1],
+                    int(float(member_info[3])),
+                )
+        self.load_stats = _load_stats(
+            membership_path, len(self.members), start
+        )
 
     def get_member(self, numeric_barcode: str) -> Member:
         if numeric_barcode in self.members:
@@ -97,52 +164,55 @@ class MemberDatabase:
         if member is not None:
             member.add_points(points)
 
-    def save_memberships(self):
-        with open(self.membership_path, "r") as file1:
-            with open(MemberDatabase.SAVE_PATH, "w") as file2:
-                lines = file1.readlines()
-                file2.write("numeric_barcode,name,tier,points\n")
-                for i in range(1, len(lines)):
-                    barcode = lines[i].strip().split(",")[0]
-                    member = self.get_member(barcode)
-                    if member != None:
-                        file2.write(
-                            str(member.get_barcode())
-                            + ","
-                            + str(member.get_name())
-                            + ","
-                            + str(member.return_membership_type())
-                            + ","
-                            + str(member.get_points())
-                            + "\n"
-                        )
+    def save_memberships(self, path: str = None):
+        """Write the current state to path (MemberDatabase.SAVE_PATH by
+        default), in the row order of the source CSV."""
+        path = path or MemberDatabase.SAVE_PATH
+        # write a temporary file and rename it over the old one, so a
+        # crash mid-save never leaves a half-written file behind
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", newline="") as file2:
+            writer = csv.writer(file2, lineterminator="\n")
+            writer.writerow(["numeric_barcode", "name", "tier", "points"])
+            for row in iter_csv_rows(self.membership_path):
+                member = self.get_member(row[0])
+                if member != None:
+                    writer.writerow(
+                        [
+                            member.get_barcode(),
+                            member.get_name(),
+                            member.return_membership_type(),
+                            member.get_points(),
+                        ]
+                    )
+            _sync(file2)
+        os.replace(tmp_path, path)
 
 
 class CouponDatabase:
     def __init__(self, coupon_path: str):
         self.coupon_path = coupon_path
         self.coupons = {}
-        with open(self.coupon_path, "r") as file:
-            lines = file.readlines()
-            for i in range(1, len(lines)):
-                coupon_info = lines[i].strip().split(",")
-                date = coupon_info[1].split("-")
-                if coupon_info[2] == "percent":
-                    self.coupons[coupon_info[0]] = PercentDiscountCoupon(
-                        str(coupon_info[0]),
-                        datetime(int(date[0]), int(date[1]), int(date[2])),
-                        float(coupon_info[4]),
-                        str(coupon_info[5]),
-                        float(coupon_info[3]),
-                    )
-                else:
-                    self.coupons[coupon_info[0]] = FixedDiscountCoupon(
-                        str(coupon_info[0]),
-                        datetime(int(date[0]), int(date[1]), int(date[2])),
-                        float(coupon_info[4]),
-                        str(coupon_info[5]),
-                        float(coupon_info[3]),
-                    )
+        start = time.perf_counter()
+        for coupon_info in iter_csv_rows(self.coupon_path):
+            date = coupon_info[1].split("-")
+            if coupon_info[2] == "percent":
+                self.coupons[coupon_info[0]] = PercentDiscountCoupon(
+                    str(coupon_info[0]),
+                    datetime(int(date[0]), int(date[1]), int(date[2])),
+                    float(coupon_info[4]),
+                    str(coupon_info[5]),
+                    float(coupon_info[3]),
+                )
+            else:
+                self.coupons[coupon_info[0]] = FixedDiscountCoupon(
+                    str(coupon_info[0]),
+                    datetime(int(date[0]), int(date[1]), int(date[2])),
+                    float(coupon_info[4]),
+                    str(coupon_info[5]),
+                    float(coupon_info[3]),
+                )
+        self.load_stats = _load_stats(coupon_path, len(self.coupons), start)
 
     def get_coupon(self, numeric_barcode: str) -> Coupon:
         if numeric_barcode in self.coupons:
@@ -179,6 +249,16 @@ def product_database_doctests():
     >>> milk3 = pdb3.get_product(milk_barcode)
     >>> milk3.get_quantity() == 140
     True
+    >>> pdb3.decrement_inventory_many({milk_barcode: 40, '027222235225': 5,
+    ...                                '000000000000': 1})
+    >>> milk3.get_quantity(), pdb3.get_product('027222235225').get_quantity()
+    (100, 195)
+    >>> pdb3.decrement_inventory_many({milk_barcode: 1, '027222235225': -1})
+    Traceback (most recent call last):
+    ...
+    ValueError: Quantities must be non-negative integers
+    >>> milk3.get_quantity()
+    100
 
     >>> pdb = ProductDatabase('db-data/test_inventory.csv')
     >>> milk = pdb.get_product('012345678905')
@@ -210,6 +290,37 @@ def product_database_doctests():
     ...     lines = f.readlines()
     >>> "012345678905,Milk,2.99,140" in [line.strip() for line in lines]
     True
+
+    >>> stats = pdb.load_stats
+    >>> stats['rows'] == len(pdb.products), stats['rows_per_second'] > 0
+    (True, True)
+
+    >>> import tempfile, tracemalloc
+    >>> tmp = tempfile.TemporaryDirectory()
+    >>> quoted = os.path.join(tmp.name, 'quoted.csv')
+    >>> with open(quoted, 'w') as f:
+    ...     _ = f.write('numeric_barcode,name,price,quantity\\n')
+    ...     _ = f.write('012345678905,"Bread, sliced",1.99,80\\n\\n')
+    >>> pdb = ProductDatabase(quoted)
+    >>> pdb.get_product('012345678905').get_name(), len(pdb.products)
+    ('Bread, sliced', 1)
+    >>> pdb.save_inventory(os.path.join(tmp.name, 'saved.csv'))
+    >>> ProductDatabase(os.path.join(tmp.name, 'saved.csv')).get_product(
+    ...     '012345678905').get_name()
+    'Bread, sliced'
+
+    >>> big = os.path.join(tmp.name, 'big.csv')
+    >>> with open(big, 'w') as f:
+    ...     _ = f.write('numeric_barcode,name,price,quantity\\n')
+    ...     for i in range(20000):
+    ...         _ = f.write(f'{i:012d},Item {i},{i % 997 / 10},{i % 50}\\n')
+    >>> tracemalloc.start()
+    >>> pdb = ProductDatabase(big)
+    >>> current, peak = tracemalloc.get_traced_memory()
+    >>> tracemalloc.stop()
+    >>> peak < 1.1 * current
+    True
+    >>> tmp.cleanup()
     """
 
 
@@ -0,0 +1,316 @@
+# journal.py
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from database import ProductDatabase, MemberDatabase, iter_csv_rows
+
+
+SNAPSHOT_META = "snapshot.json"
+JOURNAL_FILE = "journal.log"
+
+
+def _points_value(text: str):
+    """Parse saved points exactly: whole numbers stay int, fractional
+    points (from float totals) stay float."""
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+class TransactionJournal:
+    """
+    Append-only log of checkouts kept in a directory, one JSON line per
+    sale: items and quantities, coupons, member, total and points.
+
+    Appends are written straight to the OS, so a crashed process loses
+    nothing; fsync is batched, running once sync_every events or
+    sync_interval seconds have gone by since the last one (a timer
+    covers the case where no further sale arrives). recover()
+    rebuilds the databases from the base CSVs (or the latest snapshot)
+    plus the journal, and compact() folds the journal into a fresh
+    snapshot so recovery time stays bounded.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        sync_every: int = 32,
+        sync_interval: float = 0.05,
+        compact_every: int = 10000,
+    ):
+        """
+        Args:
+            directory (str): holds the journal and its snapshots.
+            sync_every (int): events between two fsyncs at most.
+            sync_interval (float): seconds between two fsyncs at most.
+            compact_every (int): events after which compaction is due.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.path = os.path.join(directory, JOURNAL_FILE)
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._drop_torn_tail()
+        self._seq = self._snapshot_meta().get("seq", 0)
+        self._since_snapshot = 0
+        for event in self.events():
+            self._seq = max(self._seq, event["seq"])
+            self._since_snapshot += 1
+        self._file = open(self.path, "a")
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        # fsyncs events still unsynced sync_interval after they came in
+        self._timer = None
+
+    def _drop_torn_tail(self):
+        # a crash mid-append can leave a last line without its newline;
+        # cut it off so the next append starts on a fresh line
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+
+    def _snapshot_meta(self) -> dict:
+        path = os.path.join(self.directory, SNAPSHOT_META)
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def append(
+        self,
+        quantities: dict,
+        member_barcode: str = None,
+        points: float = 0,
+        coupon_barcodes: list = (),
+        total: float = 0.0,
+    ) -> int:
+        """Journal one checkout. Returns its sequence number."""
+        with self._lock:
+            self._seq += 1
+            event = {
+                "seq": self._seq,
+                "time": datetime.now().isoformat(timespec="seconds"),
+                "items": quantities,
+                "coupons": list(coupon_barcodes),
+                "member": member_barcode,
+                "total": total,
+                "points": points,
+            }
+            self._file.write(json.dumps(event, separators=(",", ":")) + "\n")
+            self._file.flush()
+            self._since_snapshot += 1
+            self._unsynced += 1
+            if (
+                self._unsynced >= self.sync_every
+                or time.monotonic() - self._last_sync >= self.sync_interval
+            ):
+                self._sync()
+            elif self._timer is None:
+                self._timer = threading.Timer(
+                    self.sync_interval, self._timed_sync
+                )
+                self._timer.daemon = True
+                self._timer.start()
+            return self._seq
+
+    def _timed_sync(self):
+        with self._lock:
+            self._timer = None
+            if self._unsynced and not self._file.closed:
+                self._sync()
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        """fsync every event appended so far."""
+        with self._lock:
+            if self._unsynced:
+                self._sync()
+
+    def events(self):
+        """Yield the journaled events, oldest first."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r") as f:
+            for line in f:
+                if line.endswith("\n"):
+                    yield json.loads(line)
+
+    def compaction_due(self) -> bool:
+        return self._since_snapshot >= self.compact_every
+
+    def recover(
+        self, inventory_path: str, membership_path: str
+    ) -> tuple:
+        """Rebuild the product and member databases: load the latest
+        snapshot, or the base CSVs if there is none, then apply every
+        journaled sale after it in order.
+
+        Returns:
+            tuple: (ProductDatabase, MemberDatabase)
+        """
+        meta = self._snapshot_meta()
+        if meta:
+            products = ProductDatabase(
+                os.path.join(self.directory, meta["inventory"])
+            )
+            members = MemberDatabase(
+                os.path.join(self.directory, meta["memberships"])
+            )
+            for row in iter_csv_rows(members.membership_path):
+                members.get_member(row[0]).points = _points_value(row[3])
+            # snapshots keep the base files' rows and order, and are deleted
+            # by the next compaction, so saves keep reading the base files
+            products.inventory_path = inventory_path
+            members.membership_path = membership_path
+        else:
+            products = ProductDatabase(inventory_path)
+            members = MemberDatabase(membership_path)
+        after = meta.get("seq", 0)
+        for event in self.events():
+            if event["seq"] <= after:
+                continue
+            products.decrement_inventory_many(event["items"])
+            if event["member"] is not None:
+                members.add_points(event["member"], event["points"])
+        return products, members
+
+    def compact(
+        self, products: ProductDatabase, members: MemberDatabase
+    ):
+        """Snapshot the databases and empty the journal. The databases
+        must hold exactly the journaled sales, so no sale may be applied
+        while this runs."""
+        with self._lock:
+            seq = self._seq
+            old = self._snapshot_meta()
+            meta = {
+                "seq": seq,
+                "inventory": f"inventory.{seq}.csv",
+                "memberships": f"memberships.{seq}.csv",
+            }
+            products.save_inventory(
+                os.path.join(self.directory, meta["inventory"])
+            )
+            members.save_memberships(
+                os.path.join(self.directory, meta["memberships"])
+            )
+            # renaming the metadata into place commits the snapshot; if we
+            # crash before the journal is emptied, recover() skips the
+            # events the snapshot already holds
+            meta_path = os.path.join(self.directory, SNAPSHOT_META)
+            with open(meta_path + ".tmp", "w") as f:
+                json.dump(meta, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(meta_path + ".tmp", meta_path)
+            self._file.close()
+            self._file = open(self.path, "w")
+            self._sync()
+            self._since_snapshot = 0
+            for name in (old.get("inventory"), old.get("memberships")):
+                if name and name not in meta.values():
+                    os.remove(os.path.join(self.directory, name))
+
+    def close(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._sync()
+            self._file.close()
+
+
+def journal_doctests():
+    """Function to run the doctests for the transaction journal.
+
+    Note that you should run this doctest at the root folder of the project
+    (same level as main.py)
+
+    >>> import tempfile
+    >>> from pos import POSSystem
+    >>> from store_backend import StoreBackend
+    >>> tmp = tempfile.TemporaryDirectory()
+    >>> paths = ('db-data/inventory.csv', 'db-data/memberships.csv',
+    ...          'db-data/coupons.csv')
+    >>> def state(store):
+    ...     return (
+    ...         {c: p.get_quantity()
+    ...          for c, p in store.product_database.products.items()},
+    ...         {c: m.get_points()
+    ...          for c, m in store.member_database.members.items()},
+    ...     )
+    >>> def sell(store, n):
+    ...     pos = POSSystem(store=store)
+    ...     for _ in range(n):
+    ...         pos.process_barcodes('cart-data/scan_1_binary.txt')
+    ...         pos.checkout(save=False)
+    ...         pos.new_cart()
+
+    >>> journal = TransactionJournal(tmp.name, compact_every=5)
+    >>> store = StoreBackend(*paths, journal=journal)
+    >>> sell(store, 3)
+    >>> events = list(journal.events())
+    >>> [e['seq'] for e in events], events[0]['member']
+    ([1, 2, 3], '297458184493')
+    >>> events[0]['items'], events[0]['coupons']
+    ({'075741757551': 1, '027222235225': 1}, ['167586463312'])
+    >>> journal.close()
+
+    >>> journal = TransactionJournal(tmp.name, compact_every=5)
+    >>> recovered = StoreBackend(*paths, journal=journal)
+    >>> state(recovered) == state(store)
+    True
+    >>> sell(recovered, 4)
+    >>> sorted(os.listdir(tmp.name))
+    ['inventory.5.csv', 'journal.log', 'memberships.5.csv', 'snapshot.json']
+    >>> [e['seq'] for e in journal.events()]
+    [6, 7]
+    >>> recovered.close()
+
+    >>> journal = TransactionJournal(tmp.name)
+    >>> again = StoreBackend(*paths, journal=journal)
+    >>> state(again) == state(recovered)
+    True
+    >>> type(again.get_member('297458184493').get_points())
+    <class 'float'>
+    >>> with open(journal.path, 'a') as f:
+    ...     _ = f.write('{"seq": 8, "ite')
+    >>> journal.close()
+    >>> journal = TransactionJournal(tmp.name)
+    >>> state(StoreBackend(*paths, journal=journal)) == state(recovered)
+    True
+    >>> journal.append({'012345678905': 1})
+    8
+    >>> journal.close()
+
+    With no further sale, the timer fsyncs the last events.
+
+    >>> import time
+    >>> journal = TransactionJournal(tmp.name, sync_every=1000,
+    ...                              sync_interval=0.5)
+    >>> journal.append({'012345678905': 1})
+    9
+    >>> journal._unsynced
+    1
+    >>> deadline = time.monotonic() + 5
+    >>> while journal._unsynced and time.monotonic() < deadline:
+    ...     time.sleep(0.01)
+    >>> journal._unsynced
+    0
+    >>> journal.close()
+    >>> tmp.cleanup()
+    """
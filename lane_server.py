@@ -0,0 +1,254 @@
+# lane_server.py
+
+import argparse
+import asyncio
+import time
+
+from barcode import DecodeCache
+from pos import POSSystem
+from store_backend import StoreBackend
+
+
+class LaneServer:
+    """
+    asyncio front end that serves many scanner connections (lanes) at
+    once over TCP or a Unix socket. Each connection gets its own
+    POSSystem, and so its own ShoppingCart, on one shared StoreBackend.
+
+    Line protocol, one request per line:
+      - a binary barcode -> "<kind> <numeric barcode or reject reason>"
+      - CHECKOUT -> "total <amount>", or "error checkout_failed" if it
+        raised; either way the lane starts a new cart
+      - VOID -> "voided", the cart's reserved units are given back
+    A lane that disconnects with an open cart is voided.
+
+    Decoding a scan is a few microseconds of table lookups with no I/O,
+    so it runs on the loop; checkout, which rewrites the CSV files, runs
+    in the default executor.
+    """
+
+    def __init__(
+        self, store: StoreBackend, decode_cache: DecodeCache = None
+    ):
+        self.store = store
+        # repeat SKUs are shared by all lanes, so they share one cache
+        self.decode_cache = (
+            decode_cache if decode_cache is not None else DecodeCache()
+        )
+        self.server = None
+        self.connections = 0
+        self.checkouts = 0
+
+    async def start(
+        self, host: str = "127.0.0.1", port: int = 0, path: str = None
+    ):
+        """Start listening on host:port, or on a Unix socket if path is
+        given. Port 0 picks a free port; see address()."""
+        if path is not None:
+            self.server = await asyncio.start_unix_server(
+                self._serve_lane, path
+            )
+        else:
+            self.server = await asyncio.start_server(
+                self._serve_lane, host, port
+            )
+        return self.server
+
+    def address(self):
+        return self.server.sockets[0].getsockname()
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _serve_lane(self, reader, writer):
+        self.connections += 1
+        pos = POSSystem(store=self.store, decode_cache=self.decode_cache)
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = line.strip()
+                if request == b"CHECKOUT":
+                    try:
+                        total = await loop.run_in_executor(
+                            None, pos.checkout
+                        )
+                    except Exception:
+                        # e.g. the save failed after the units were sold,
+                        # so the cart must not be voided and released twice
+                        writer.write(b"error checkout_failed\n")
+                    else:
+                        self.checkouts += 1
+                        writer.write(f"total {total}\n".encode())
+                    finally:
+                        pos.new_cart()
+                elif request == b"VOID":
+                    pos.void_cart()
+                    writer.write(b"voided\n")
+                else:
+                    for result in pos.ingest((request,)):
+                        detail = result.reason or result.numeric_barcode
+                        writer.write(f"{result.kind} {detail}\n".encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            pos.void_cart()
+            writer.close()
+
+
+async def simulate_lanes(
+    n_lanes: int,
+    scan_path: str,
+    host: str = "127.0.0.1",
+    port: int = None,
+    path: str = None,
+    checkout: bool = True,
+) -> list:
+    """Test client: open n_lanes connections at once, send every line of
+    scan_path on each, then CHECKOUT. Returns one list of response lines
+    per lane."""
+    with open(scan_path, "r") as f:
+        scans = [line.strip() for line in f if line.strip()]
+    payload = "".join(f"{scan}\n" for scan in scans)
+    if checkout:
+        payload += "CHECKOUT\n"
+    expected = len(scans) + (1 if checkout else 0)
+
+    async def lane():
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        writer.write(payload.encode())
+        await writer.drain()
+        responses = []
+        for _ in range(expected):
+            responses.append((await reader.readline()).decode().strip())
+        writer.close()
+        await writer.wait_closed()
+        return responses
+
+    return await asyncio.gather(*(lane() for _ in range(n_lanes)))
+
+
+def lane_server_doctests():
+    """Function to run the doctests for the LaneServer class.
+
+    Note that you should run this doctest at the root folder of the project
+    (same level as main.py)
+
+    >>> store = StoreBackend(
+    ...     'db-data/inventory.csv',
+    ...     'db-data/memberships.csv',
+    ...     'db-data/coupons.csv'
+    ... )
+    >>> server = LaneServer(store)
+    >>> async def run():
+    ...     await server.start()
+    ...     host, port = server.address()
+    ...     lanes = await simulate_lanes(
+    ...         100, 'cart-data/scan_1_binary.txt', host, port
+    ...     )
+    ...     await server.close()
+    ...     return lanes
+    >>> lanes = asyncio.run(run())
+    >>> lanes[0][:2]
+    ['coupon 167586463312', 'membership 297458184493']
+    >>> lanes[0][2:4]
+    ['item 075741757551', 'item 027222235225']
+    >>> all(lane[-1].startswith('total ') for lane in lanes)
+    True
+    >>> server.connections, server.checkouts
+    (100, 100)
+    >>> store.get_product('075741757551').get_quantity()
+    0
+    >>> sum(lane[2].startswith('item') for lane in lanes)
+    60
+    >>> store.get_reserved('075741757551')
+    0
+
+    A checkout that fails after selling leaves other lanes' reservations
+    alone.
+
+    >>> from tester_student import barcode_digits2binary
+    >>> flaky = StoreBackend(
+    ...     'db-data/inventory.csv',
+    ...     'db-data/memberships.csv',
+    ...     'db-data/coupons.csv'
+    ... )
+    >>> def full_disk(timings=None):
+    ...     raise OSError('No space left on device')
+    >>> flaky.save_changes = full_disk
+    >>> milk = barcode_digits2binary('012345678905').encode() + b'\\n'
+    >>> async def fail_checkout():
+    ...     server = LaneServer(flaky)
+    ...     await server.start()
+    ...     host, port = server.address()
+    ...     r1, w1 = await asyncio.open_connection(host, port)
+    ...     r2, w2 = await asyncio.open_connection(host, port)
+    ...     w1.write(milk)
+    ...     w2.write(milk)
+    ...     replies = [await r1.readline(), await r2.readline()]
+    ...     w1.write(b'CHECKOUT\\n')
+    ...     replies.append(await r1.readline())
+    ...     held = flaky.get_reserved('012345678905')
+    ...     w1.close()
+    ...     w2.close()
+    ...     # lane 2 hung up with an open cart, so its unit is released
+    ...     while flaky.get_reserved('012345678905'):
+    ...         await asyncio.sleep(0.01)
+    ...     await server.close()
+    ...     return replies, held
+    >>> replies, held = asyncio.run(fail_checkout())
+    >>> replies[2], held
+    (b'error checkout_failed\\n', 1)
+    >>> flaky.get_product('012345678905').get_quantity()
+    149
+    """
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="POS lane server")
+    parser.add_argument("mode", choices=("serve", "simulate"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="Unix socket path instead of TCP")
+    parser.add_argument("--inventory", default="db-data/inventory.csv")
+    parser.add_argument("--memberships", default="db-data/memberships.csv")
+    parser.add_argument("--coupons", default="db-data/coupons.csv")
+    parser.add_argument("--lanes", type=int, default=100)
+    parser.add_argument("--scans", default="cart-data/test_scan_binary.txt")
+    args = parser.parse_args()
+
+    if args.mode == "serve":
+
+        async def serve():
+            # checkouts only mark the CSVs dirty; a background writer
+            # saves them, and again when the server exits
+            store = StoreBackend(
+                args.inventory,
+                args.memberships,
+                args.coupons,
+                write_behind=True,
+            )
+            server = await LaneServer(store).start(
+                args.host, args.port, args.unix
+            )
+            async with server:
+                await server.serve_forever()
+
+        asyncio.run(serve())
+    else:
+        start = time.perf_counter()
+        lanes = asyncio.run(
+            simulate_lanes(
+                args.lanes, args.scans, args.host, args.port, args.unix
+            )
+        )
+        elapsed = time.perf_counter() - start
+        scans = sum(len(lane) for lane in lanes)
+        print(f"{args.lanes} lanes, {scans} responses in {elapsed:.2f}s")
@@ -0,0 +1,74 @@
+# money.py
+
+from decimal import Decimal, ROUND_FLOOR, ROUND_HALF_UP
+
+
+def parse_cents(text: str) -> int:
+    """Parse a decimal amount such as '2.99', '60.0' or '5' into integer
+    cents. Amounts with fractions of a cent are rounded half up.
+
+    >>> parse_cents('2.99'), parse_cents('60.0'), parse_cents('5')
+    (299, 6000, 500)
+    >>> parse_cents('0.005'), parse_cents('1.994')
+    (1, 199)
+    """
+    whole, _, fraction = text.strip().partition(".")
+    if len(fraction) <= 2 and (whole + fraction).isdigit():
+        return int(whole or "0") * 100 + int(fraction.ljust(2, "0"))
+    return int(
+        (Decimal(text) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+    )
+
+
+def to_cents(amount) -> int:
+    """Convert a price read as a float (or an int) to integer cents. A
+    float's repr is the shortest text that reads back as it, so this
+    gives the cents of the text the float was parsed from.
+
+    >>> to_cents(2.99), to_cents(4.5), to_cents(3)
+    (299, 450, 300)
+    """
+    return parse_cents(repr(amount))
+
+
+def format_cents(cents: int) -> str:
+    """Format cents as a decimal amount, e.g. 299 -> '2.99'.
+
+    >>> format_cents(299), format_cents(5), format_cents(-120)
+    ('2.99', '0.05', '-1.20')
+    """
+    sign = "-" if cents < 0 else ""
+    return f"{sign}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+
+def scale_cents(cents: int, factor) -> int:
+    """Return cents * factor rounded half up to a whole cent. factor is a
+    rate such as a discount rate or percent / 100, taken by its decimal
+    value (0.1 is exactly a tenth).
+
+    >>> scale_cents(1999, 0.05), scale_cents(570, 0.1), scale_cents(25, 0.5)
+    (100, 57, 13)
+    """
+    exact = Decimal(cents) * Decimal(repr(factor))
+    return int(exact.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def percent_of_cents(cents: int, percent) -> int:
+    """Return percent % of cents, rounded half up to a whole cent.
+
+    >>> percent_of_cents(2500, 15.5), percent_of_cents(999, 10)
+    (388, 100)
+    """
+    exact = Decimal(cents) * Decimal(repr(percent)) / 100
+    return int(exact.quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def points_for_cents(cents: int, multiplier) -> int:
+    """Whole points earned on a total of cents at multiplier points per
+    dollar, rounded down.
+
+    >>> points_for_cents(415, 1.5), points_for_cents(1999, 1.1)
+    (6, 21)
+    """
+    exact = Decimal(cents) * Decimal(repr(multiplier)) / 100
+    return int(exact.to_integral_value(rounding=ROUND_FLOOR))
@@ -0,0 +1,213 @@
+# persistence.py
+
+import atexit
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindWriter:
+    """
+    Calls a flush function from a background thread instead of on the
+    caller's path. Callers only mark_dirty(); changes are coalesced and
+    flushed once max_changes have piled up or interval seconds after the
+    first unflushed change, whichever comes first. flush() writes now,
+    and close() (also run at interpreter exit) writes whatever is left.
+    """
+
+    def __init__(
+        self, flush_fn, interval: float = 1.0, max_changes: int = 100
+    ):
+        """
+        Args:
+            flush_fn: called with no arguments to write the dirty state.
+            interval (float): longest a change waits before being flushed.
+            max_changes (int): changes that trigger a flush straight away.
+        """
+        if interval <= 0 or max_changes <= 0:
+            raise ValueError(
+                "Flush interval and change count must be positive"
+            )
+        self.flush_fn = flush_fn
+        self.interval = interval
+        self.max_changes = max_changes
+        self.flushes = 0
+        self._pending = 0
+        self._first_change = None
+        self._closed = False
+        self._changed = threading.Condition()
+        # one flush at a time, whether from the thread or from flush()
+        self._flush_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @property
+    def pending(self) -> int:
+        """Changes marked since the last flush."""
+        return self._pending
+
+    def mark_dirty(self):
+        """Record one change. Once the writer is closed, flushes at once."""
+        with self._changed:
+            closed = self._closed
+            if not closed:
+                self._pending += 1
+                if self._pending == 1:
+                    # wake the thread to start the interval countdown
+                    self._first_change = time.monotonic()
+                    self._changed.notify()
+                elif self._pending >= self.max_changes:
+                    self._changed.notify()
+        if closed:
+            with self._flush_lock:
+                self.flush_fn()
+                self.flushes += 1
+
+    def flush(self) -> bool:
+        """Write pending changes now. Returns whether anything was written."""
+        with self._flush_lock:
+            with self._changed:
+                pending = self._pending
+                self._pending = 0
+                self._first_change = None
+            if not pending:
+                return False
+            try:
+                self.flush_fn()
+            except BaseException:
+                # keep the changes pending so the next flush retries them
+                with self._changed:
+                    if self._pending == 0:
+                        self._first_change = time.monotonic()
+                    self._pending += pending
+                raise
+            self.flushes += 1
+            return True
+
+    def close(self):
+        """Stop the background thread and flush what is left."""
+        with self._changed:
+            self._closed = True
+            self._changed.notify()
+        self._thread.join()
+        self.flush()
+        atexit.unregister(self.close)
+
+    def _due(self) -> bool:
+        return self._pending >= self.max_changes or (
+            self._pending > 0
+            and time.monotonic() >= self._first_change + self.interval
+        )
+
+    def _run(self):
+        while True:
+            with self._changed:
+                while not self._closed and not self._due():
+                    timeout = None
+                    if self._pending:
+                        timeout = (
+                            self._first_change
+                            + self.interval
+                            - time.monotonic()
+                        )
+                    self._changed.wait(timeout)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                # e.g. a full disk or a bad row: the changes stay pending
+                # and the flush is retried after another interval
+                logger.exception("Write-behind flush failed")
+                with self._changed:
+                    if not self._closed:
+                        self._changed.wait(self.interval)
+
+
+def persistence_doctests():
+    """Function to run the doctests for the write-behind writer.
+
+    Note that you should run this doctest at the root folder of the project
+    (same level as main.py)
+
+    >>> import time
+    >>> written = []
+    >>> writer = WriteBehindWriter(lambda: written.append(1),
+    ...                            interval=60, max_changes=3)
+    >>> writer.mark_dirty()
+    >>> writer.mark_dirty()
+    >>> writer.pending, written
+    (2, [])
+    >>> writer.flush()
+    True
+    >>> writer.pending, written
+    (0, [1])
+    >>> writer.flush()
+    False
+    >>> for _ in range(3):
+    ...     writer.mark_dirty()
+    >>> deadline = time.monotonic() + 5
+    >>> while writer.flushes < 2 and time.monotonic() < deadline:
+    ...     time.sleep(0.01)
+    >>> writer.flushes, writer.pending
+    (2, 0)
+    >>> writer.mark_dirty()
+    >>> writer.close()
+    >>> writer.flushes, writer.pending
+    (3, 0)
+
+    >>> timed = WriteBehindWriter(lambda: None, interval=0.05)
+    >>> timed.mark_dirty()
+    >>> deadline = time.monotonic() + 5
+    >>> while timed.flushes < 1 and time.monotonic() < deadline:
+    ...     time.sleep(0.01)
+    >>> timed.flushes
+    1
+    >>> timed.close()
+
+    A failing flush is logged and retried; the thread keeps running.
+
+    >>> failures = [KeyError('sku')]
+    >>> def flaky_flush():
+    ...     if failures:
+    ...         raise failures.pop()
+    >>> logger.disabled = True
+    >>> retried = WriteBehindWriter(flaky_flush, interval=0.05)
+    >>> retried.mark_dirty()
+    >>> deadline = time.monotonic() + 5
+    >>> while retried.flushes < 1 and time.monotonic() < deadline:
+    ...     time.sleep(0.01)
+    >>> retried.flushes, retried.pending, failures
+    (1, 0, [])
+    >>> retried.mark_dirty()
+    >>> retried.close()
+    >>> retried.flushes
+    2
+    >>> logger.disabled = False
+
+    >>> from store_backend import StoreBackend
+    >>> from database import ProductDatabase
+    >>> def saved_milk():
+    ...     with open(ProductDatabase.SAVE_PATH) as f:
+    ...         return [line for line in f if 'Milk' in line]
+    >>> store = StoreBackend('db-data/inventory.csv',
+    ...                      'db-data/memberships.csv',
+    ...                      'db-data/coupons.csv',
+    ...                      write_behind=True, flush_interval=60)
+    >>> milk = store.get_product('012345678905')
+    >>> store.save_changes()
+    >>> store.flush()
+    >>> saved_milk()
+    ['012345678905,Milk,2.99,150\\n']
+    >>> store.decrease_product_quantity(milk, 10)
+    >>> store.save_changes()
+    >>> saved_milk()
+    ['012345678905,Milk,2.99,150\\n']
+    >>> store.close()
+    >>> saved_milk()
+    ['012345678905,Milk,2.99,140\\n']
+    """
@@ -1,8 +1,55 @@
 # pos.py
 
+from time import perf_counter_ns
+
 from store_backend import StoreBackend
-from barcode import BarcodeProcessor
+from barcode import BarcodeProcessor, DecodeCache
 from cart import ShoppingCart
+from scanfile import PackedScanReader, is_packed_scan_file
+from timing import StageTimings
+from profiling import Profiler, profiled
+
+
+# reasons a decoded barcode is still not added to the cart
+LOOKUP_REJECTIONS = (
+    "unknown_product",
+    "out_of_stock",
+    "unknown_coupon",
+    "unknown_member",
+)
+# barcode types counted for decoded scans; "unknown" is any first digit
+# other than 0/1/2 (looked up as a product)
+BARCODE_TYPES = ("product", "coupon", "membership", "unknown")
+
+
+class ScanResult:
+    """
+    Outcome of one scan fed to POSSystem.ingest:
+      - kind: ITEM, COUPON, MEMBERSHIP or REJECTED
+      - numeric_barcode: the decoded barcode, None if it did not decode
+      - entry: the Product, Coupon or Member added to the cart
+      - reason: why a rejected scan was rejected (see scan_stats)
+    """
+
+    ITEM = "item"
+    COUPON = "coupon"
+    MEMBERSHIP = "membership"
+    REJECTED = "rejected"
+
+    def __init__(
+        self, kind: str, numeric_barcode: str, entry, reason: str = None
+    ):
+        self.kind = kind
+        self.numeric_barcode = numeric_barcode
+        self.entry = entry
+        self.reason = reason
+
+    def accepted(self) -> bool:
+        return self.kind != ScanResult.REJECTED
+
+    def __repr__(self):
+        detail = self.reason if self.reason else self.numeric_barcode
+        return f"ScanResult({self.kind}, {detail})"
 
 
 class POSSystem:
@@ -14,70 +61,182 @@ class POSSystem:
     """
 
     def __init__(
-        self, inventory_path: str, membership_path: str, coupon_path: str
+        self,
+        inventory_path: str = None,
+        membership_path: str = None,
+        coupon_path: str = None,
+        decode_cache: DecodeCache | None = None,
+        store: StoreBackend | None = None,
+        timings: StageTimings | None = None,
+        profiler: Profiler | None = None,
+        cart_factory=ShoppingCart,
     ):
-        # back‐end databases
-        self.store = StoreBackend(inventory_path, membership_path, coupon_path)
-        # low‐level barcode validation & conversion
-        self.barcode_processor = BarcodeProcessor()
-        # the cart for the current transaction
-        self.cart = ShoppingCart()
+        # back‐end databases; lanes in one process can share a store
+        if store is None:
+            store = StoreBackend(inventory_path, membership_path, coupon_path)
+        self.store = store
+        # low‐level barcode validation & conversion; lanes may share one
+        # decode_cache so repeat scans skip decoding
+        self.barcode_processor = BarcodeProcessor(decode_cache)
+        # the cart for the current transaction; CompactShoppingCart suits
+        # very large carts
+        self.cart_factory = cart_factory
+        self.cart = cart_factory()
+        # direction of the last barcode that decoded, used when a scan's
+        # orientation cannot be told from its modules
+        self.orientation_hint = BarcodeProcessor.FORWARD
+        self.reset_scan_stats()
+        # per-stage latency histograms; None turns timing off
+        self.timings = timings
+        # profiles process_barcodes and checkout; without one given, the
+        # POS_PROFILE environment variable decides (see profiling.py)
+        if profiler is None:
+            profiler = Profiler.from_env()
+        self.profiler = profiler
 
+    def reset_scan_stats(self) -> None:
+        """Zero the scan counters, e.g. at the start of a transaction or
+        shift. The orientation hint is kept."""
+        # how often each decode path was taken
+        self.orientation_counts = {
+            BarcodeProcessor.FORWARD: 0,
+            BarcodeProcessor.REVERSED: 0,
+            BarcodeProcessor.HINT: 0,
+        }
+        # rejected scans by reason: decode statuses, then lookup failures
+        self.rejection_counts = dict.fromkeys(
+            list(BarcodeProcessor.STATUS_NAMES.values())
+            + list(LOOKUP_REJECTIONS),
+            0,
+        )
+        # decoded, check-digit-valid scans by barcode type
+        self.type_counts = dict.fromkeys(BARCODE_TYPES, 0)
+
+    def scan_stats(self) -> dict:
+        """Return a copy of the scan counters."""
+        return {
+            "orientation": dict(self.orientation_counts),
+            "rejections": dict(self.rejection_counts),
+            "types": dict(self.type_counts),
+        }
+
+    @profiled
     def process_barcodes(self, barcode_path: str) -> None:
         """
-        Read each line of the given file as a binary barcode (95 bits).
-        For each:
-          1) try validate+convert; if ValueError, flip and retry;
-          2) if still invalid, skip;
-          3) do a modulo check (raises ValueError on failure), skip if invalid;
-          4) identify type and add to cart if matches & in stock.
+        Read each line of the given file as a binary barcode (95 bits), or
+        each record of a packed scan file (see scanfile.py), and feed it
+        through ingest().
         """
+        if is_packed_scan_file(barcode_path):
+            with PackedScanReader(barcode_path) as reader:
+                for _ in self.ingest(reader):
+                    pass
+            return
+
         with open(barcode_path, "r") as f:
-            for raw in f:
-                b = raw.strip()
-                # 1) validate & convert (original or flipped)
-                try:
-                    num = self.barcode_processor.convert_to_12_digits(b)
-                except ValueError:
-                    try:
-                        flipped = self.barcode_processor.invert_barcode(b)
-                        num = self.barcode_processor.convert_to_12_digits(
-                            flipped
-                        )
-                    except ValueError:
-                        # both original and flipped failed
-                        continue
-
-                # 2) modulo check
-                try:
-                    self.barcode_processor.modulo_check(num)
-                except ValueError:
-                    continue
-
-                # 3) identify and add to cart
-                kind = self._identify_barcode_type(num)
-                if kind == "product":
-                    prod = self.store.get_product(num)
-                    if (
-                        prod
-                        and prod.is_in_stock()
-                        and sum(
-                            p.numeric_barcode == prod.numeric_barcode
-                            for p in self.cart.products
-                        )
-                        < prod.get_quantity()
-                    ):
-                        self.cart.add_item(prod)
-
-                elif kind == "coupon":
-                    coup = self.store.get_coupon(num)
-                    if coup:
-                        self.cart.add_coupon(coup)
-
-                elif kind == "membership":
-                    mem = self.store.get_member(num)
-                    if mem:
-                        self.cart.add_membership(mem)
+            for _ in self.ingest(f):
+                pass
+
+    def ingest(self, scans):
+        """
+        Add scans to the cart as they arrive and yield a ScanResult for
+        each one. scans may be any iterable: a list, a generator, a file
+        object, sys.stdin, a ScanBuffer fed by a device, or a
+        PackedScanReader. Text scans (str or bytes) are stripped; int
+        scans are packed records.
+        For each:
+          1) detect orientation and decode once in that direction,
+             including the modulo check;
+          2) if invalid, reject;
+          3) identify type and add to cart if matches & in stock.
+        """
+        bp = self.barcode_processor
+        for scan in scans:
+            timings = self.timings
+            if timings is not None:
+                start = perf_counter_ns()
+            if isinstance(scan, int):
+                decoded = bp.decode_packed_oriented(
+                    scan, self.orientation_hint, check=True
+                )
+            else:
+                if isinstance(scan, bytes):
+                    scan = scan.decode("ascii", "replace")
+                decoded = bp.decode_oriented(
+                    scan.strip(), self.orientation_hint, check=True
+                )
+            if timings is not None:
+                timings.lap("decode", start)
+            yield self._add_decoded(*decoded)
+
+    def add_numeric_barcode(self, numeric_barcode: str):
+        """Add a barcode that was already decoded and modulo-checked
+        elsewhere (e.g. by a replay worker). Returns its ScanResult."""
+        return self._add_scanned(numeric_barcode)
+
+    def _add_decoded(self, status: int, num: str, orientation: str):
+        """Record the decode path taken and add a decoded barcode."""
+        if orientation is not None:
+            self.orientation_counts[orientation] += 1
+        if status in (BarcodeProcessor.OK, BarcodeProcessor.CHECK_FAILED):
+            # the modules decoded, so the direction was right
+            self.orientation_hint = orientation
+        if num is None:
+            reason = BarcodeProcessor.STATUS_NAMES[status]
+            self.rejection_counts[reason] += 1
+            return ScanResult(ScanResult.REJECTED, None, None, reason)
+        return self._add_scanned(num)
+
+    def _add_scanned(self, num: str):
+        """Add a decoded, modulo-checked barcode to the cart."""
+        timings = self.timings
+        if timings is not None:
+            start = perf_counter_ns()
+        # identify and add to cart
+        kind = self._identify_barcode_type(num)
+        self.type_counts[kind if num[0] in "012" else "unknown"] += 1
+        if timings is not None:
+            start = timings.lap("identify", start)
+        reason = None
+        if kind == "product":
+            prod = self.store.get_product(num)
+            if timings is not None:
+                start = timings.lap("lookup", start)
+            if not prod:
+                reason = "unknown_product"
+            elif self.store.reserve_product(prod):
+                # the unit is held for this cart until checkout or void
+                self.cart.add_item(prod)
+                if timings is not None:
+                    timings.lap("cart_add", start)
+                return ScanResult(ScanResult.ITEM, num, prod)
+            else:
+                reason = "out_of_stock"
+
+        elif kind == "coupon":
+            coup = self.store.get_coupon(num)
+            if timings is not None:
+                start = timings.lap("lookup", start)
+            if coup:
+                self.cart.add_coupon(coup)
+                if timings is not None:
+                    timings.lap("cart_add", start)
+                return ScanResult(ScanResult.COUPON, num, coup)
+            reason = "unknown_coupon"
+
+        elif kind == "membership":
+            mem = self.store.get_member(num)
+            if timings is not None:
+                start = timings.lap("lookup", start)
+            if mem:
+                self.cart.add_membership(mem)
+                if timings is not None:
+                    timings.lap("cart_add", start)
+                return ScanResult(ScanResult.MEMBERSHIP, num, mem)
+            reason = "unknown_member"
+
+        self.rejection_counts[reason] += 1
+        return ScanResult(ScanResult.REJECTED, num, None, reason)
 
     def _identify_barcode_type(self, numeric_barcode: str) -> str:
         """
@@ -93,35 +252,58 @@ class POSSystem:
         # unexpected first digit: treat as product by default
         return "product"
 
-    def checkout(self) -> float:
+    @profiled
+    def checkout(self, save: bool = True) -> float:
         """
         Finalize the sale:
           - compute total
           - decrement inventory by 1 per product
           - award points to membership based on total paid
-          - save inventory & memberships
+          - save inventory & memberships, or hand them to the store's
+            write-behind writer (unless save is False, e.g. when a batch
+            of transactions is saved once at the end)
         Returns:
           final total charge (float)
         """
+        timings = self.timings
+        if timings is not None:
+            start = perf_counter_ns()
         total = self.cart.calculate_total()
+        if timings is not None:
+            timings.lap("calculate_total", start)
 
-        # update inventory
-        for p in self.cart.get_items():
-            self.store.decrease_product_quantity(p, 1)
-
-        # update membership points
+        # update membership points (whole points, rounded down, with a
+        # CentsShoppingCart)
         member = self.cart.get_membership()
-        if member:
-            # points multiplier is per-dollar; round down to integer points
-            pts = total * member.get_points_multiplier()
-            self.store.add_member_points(member, pts)
+        pts = self.cart.calculate_points(total)
+
+        # update inventory in one bulk call, selling the units reserved at
+        # scan time, and add the points (journaled if the store keeps one)
+        self.store.record_sale(
+            self.cart.quantities,
+            member,
+            pts,
+            self.cart.coupons,
+            total,
+            timings,
+        )
 
         # persist changes
-        self.store.save_inventory()
-        self.store.save_memberships()
+        if save:
+            self.store.save_changes(timings)
 
         return total
 
+    def void_cart(self) -> None:
+        """Abandon the current transaction: give back the units its cart
+        reserved and start an empty cart."""
+        self.store.release_products(self.cart.quantities)
+        self.cart = self.cart_factory()
+
+    def new_cart(self) -> None:
+        """Start an empty cart for the next transaction after checkout."""
+        self.cart = self.cart_factory()
+
     def get_current_cart(self) -> ShoppingCart:
         """Return the ShoppingCart for the current transaction."""
         return self.cart
@@ -230,6 +412,157 @@ def pos_doctests(self):
     ...         calculated_types.append(barcode_type)
     >>> expected_types == calculated_types
     True
+    >>> pos.orientation_counts
+    {'forward': 994, 'reversed': 0, 'hint': 0}
+    >>> stats = pos.scan_stats()
+    >>> stats['types']
+    {'product': 508, 'coupon': 243, 'membership': 243, 'unknown': 0}
+    >>> {k: v for k, v in stats['rejections'].items() if v}
+    {'out_of_stock': 248}
+    >>> pos.reset_scan_stats()
+    >>> sum(pos.scan_stats()['types'].values())
+    0
+    >>> import os, tempfile
+    >>> from tester_student import barcode_digits2binary
+    >>> good = barcode_digits2binary('012345678905')
+    >>> scans = [good[::-1], good[:90], good[:3] + '1110010' + good[10:],
+    ...          barcode_digits2binary('012345678900'),
+    ...          barcode_digits2binary('036000291452'),
+    ...          barcode_digits2binary('900000000003')]
+    >>> fd, path = tempfile.mkstemp()
+    >>> with os.fdopen(fd, 'w') as f:
+    ...     for scan in scans:
+    ...         print(scan, file=f)
+    >>> pos.process_barcodes(path)
+    >>> os.remove(path)
+    >>> stats = pos.scan_stats()
+    >>> rejections = {k: v for k, v in stats['rejections'].items() if v}
+    >>> rejections['wrong_length'], rejections['wrong_left_parity']
+    (1, 1)
+    >>> rejections['check_failed'], rejections['unknown_product']
+    (1, 2)
+    >>> stats['types']
+    {'product': 2, 'coupon': 0, 'membership': 0, 'unknown': 1}
+    >>> stats['orientation']
+    {'forward': 3, 'reversed': 1, 'hint': 1}
+
+    >>> pos = POSSystem(
+    ...     'db-data/inventory.csv',
+    ...     'db-data/memberships.csv',
+    ...     'db-data/coupons.csv'
+    ... )
+    >>> list(pos.ingest(s for s in scans[:2]))
+    [ScanResult(item, 012345678905), ScanResult(rejected, wrong_length)]
+    >>> with open('cart-data/scan_1_binary.txt', 'rb') as f:
+    ...     results = list(pos.ingest(f))
+    >>> [r.kind for r in results]
+    ['coupon', 'membership', 'item', 'item']
+    >>> results[1].entry.get_name()
+    'John Smith'
+
+    >>> import threading
+    >>> from store_backend import StoreBackend
+    >>> shared = StoreBackend(
+    ...     'db-data/inventory.csv',
+    ...     'db-data/memberships.csv',
+    ...     'db-data/coupons.csv'
+    ... )
+    >>> lanes = [POSSystem(store=shared) for _ in range(4)]
+    >>> threads = [
+    ...     threading.Thread(
+    ...         target=lane.process_barcodes,
+    ...         args=('cart-data/test_scan_binary.txt',),
+    ...     )
+    ...     for lane in lanes
+    ... ]
+    >>> for t in threads:
+    ...     t.start()
+    >>> for t in threads:
+    ...     t.join()
+    >>> sum(lane.get_current_cart().get_quantity('027222235225')
+    ...     for lane in lanes)
+    200
+    >>> lanes[0].void_cart()
+    >>> shared.get_reserved('027222235225') == sum(
+    ...     lane.get_current_cart().get_quantity('027222235225')
+    ...     for lane in lanes)
+    True
+
+    >>> from scanstream import ScanBuffer, pump
+    >>> pos = POSSystem(
+    ...     'db-data/inventory.csv',
+    ...     'db-data/memberships.csv',
+    ...     'db-data/coupons.csv'
+    ... )
+    >>> buffer = ScanBuffer(maxsize=8)
+    >>> f = open('cart-data/test_scan_binary.txt', 'r')
+    >>> producer = pump(f, buffer)
+    >>> accepted = sum(r.accepted() for r in pos.ingest(buffer))
+    >>> producer.join(); f.close()
+    >>> accepted, len(pos.get_current_cart().get_items())
+    (746, 260)
+
+    >>> from barcode import DecodeCache
+    >>> cache = DecodeCache(capacity=16)
+    >>> lanes = [
+    ...     POSSystem(
+    ...         'db-data/inventory.csv',
+    ...         'db-data/memberships.csv',
+    ...         'db-data/coupons.csv',
+    ...         decode_cache=cache,
+    ...     )
+    ...     for _ in range(2)
+    ... ]
+    >>> for lane in lanes:
+    ...     lane.process_barcodes('cart-data/test_scan_binary.txt')
+    >>> [len(lane.get_current_cart().get_items()) for lane in lanes]
+    [260, 260]
+    >>> cache.stats()['misses'] == len(cache)
+    True
+
+    >>> from cart import CompactShoppingCart
+    >>> compact = POSSystem(
+    ...     'db-data/inventory.csv',
+    ...     'db-data/memberships.csv',
+    ...     'db-data/coupons.csv',
+    ...     cart_factory=CompactShoppingCart,
+    ... )
+    >>> compact.process_barcodes('cart-data/test_scan_binary.txt')
+    >>> cart = compact.get_current_cart()
+    >>> [p.get_barcode() for p in cart.iter_items()] == [
+    ...     p.get_barcode() for p in lanes[0].get_current_cart().get_items()]
+    True
+    >>> cart.calculate_total() == lanes[0].get_current_cart().calculate_total()
+    True
+    >>> compact.checkout(save=False) > 0, type(compact.get_current_cart())
+    (True, <class 'cart.CompactShoppingCart'>)
+
+    >>> from datetime import datetime
+    >>> from functools import partial
+    >>> from cart import CentsShoppingCart
+    >>> from database import ProductDatabase, MemberDatabase
+    >>> saves = tempfile.TemporaryDirectory()
+    >>> save_paths = ProductDatabase.SAVE_PATH, MemberDatabase.SAVE_PATH
+    >>> ProductDatabase.SAVE_PATH = os.path.join(saves.name, 'inventory.csv')
+    >>> MemberDatabase.SAVE_PATH = os.path.join(saves.name, 'memberships.csv')
+    >>> pos = POSSystem(
+    ...     'db-data/inventory.csv',
+    ...     'db-data/memberships.csv',
+    ...     'db-data/coupons.csv',
+    ...     cart_factory=partial(CentsShoppingCart, now=datetime(2026, 1, 1)),
+    ... )
+    >>> pos.process_barcodes('cart-data/scan_1_binary.txt')
+    >>> cents_cart = pos.get_current_cart()
+    >>> cents_cart.calculate_total_cents() == round(
+    ...     cents_cart.calculate_total() * 100)
+    True
+    >>> pos.checkout()
+    0.41
+    >>> with open(MemberDatabase.SAVE_PATH) as f:
+    ...     [line.strip() for line in f if 'John Smith' in line]
+    ['297458184493,John Smith,Gold,5400']
+    >>> ProductDatabase.SAVE_PATH, MemberDatabase.SAVE_PATH = save_paths
+    >>> saves.cleanup()
 
 
     """
@@ -0,0 +1,160 @@
+# profiling.py
+
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+
+# POS_PROFILE=<directory> (or 1 for ./profiles) turns profiling on for
+# every POSSystem; POS_PROFILE_MEMORY=1 adds tracemalloc
+PROFILE_ENV = "POS_PROFILE"
+PROFILE_MEMORY_ENV = "POS_PROFILE_MEMORY"
+DEFAULT_DIRECTORY = "profiles"
+
+# only one profiler can be active per process, so concurrent lanes take
+# turns; a call that finds the profiler busy runs unprofiled
+_active = threading.Lock()
+
+
+class Profiler:
+    """
+    Runs calls under cProfile, and optionally tracemalloc, and writes
+    each call's results next to each other in a directory:
+      - <label>-<timestamp>.prof: the raw cProfile stats (pstats, snakeviz)
+      - <label>-<timestamp>.txt: wall time, the top functions by
+        cumulative time and the top allocation sites
+    """
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_DIRECTORY,
+        memory: bool = False,
+        top: int = 20,
+    ):
+        """
+        Args:
+            directory (str): where the result files are written.
+            memory (bool): also trace allocations with tracemalloc.
+            top (int): functions and allocation sites in each summary.
+        """
+        self.directory = directory
+        self.memory = memory
+        self.top = top
+        self.last_report = None
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        """Return a Profiler configured by POS_PROFILE and
+        POS_PROFILE_MEMORY, or None when POS_PROFILE is unset or 0."""
+        setting = environ.get(PROFILE_ENV, "")
+        if setting in ("", "0"):
+            return None
+        directory = DEFAULT_DIRECTORY if setting == "1" else setting
+        memory = environ.get(PROFILE_MEMORY_ENV, "") not in ("", "0")
+        return cls(directory, memory)
+
+    def run(self, label: str, fn, *args, **kwargs):
+        """Call fn(*args, **kwargs) under the profiler and return its
+        result. The summary path is kept in last_report."""
+        if not _active.acquire(blocking=False):
+            return fn(*args, **kwargs)
+        try:
+            tracing = self.memory and not tracemalloc.is_tracing()
+            if tracing:
+                tracemalloc.start()
+            before = tracemalloc.take_snapshot() if self.memory else None
+            profile = cProfile.Profile()
+            started = datetime.now()
+            start = time.perf_counter()
+            try:
+                return profile.runcall(fn, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                after = tracemalloc.take_snapshot() if self.memory else None
+                if tracing:
+                    tracemalloc.stop()
+                self._write(label, started, elapsed, profile, before, after)
+        finally:
+            _active.release()
+
+    def _write(self, label, started, elapsed, profile, before, after):
+        os.makedirs(self.directory, exist_ok=True)
+        stem = os.path.join(
+            self.directory, f"{label}-{started:%Y%m%d-%H%M%S-%f}"
+        )
+        profile.dump_stats(stem + ".prof")
+        out = io.StringIO()
+        out.write(f"{label} at {started.isoformat()}: {elapsed:.6f}s\n\n")
+        out.write(f"Top {self.top} functions by cumulative time\n")
+        stats = pstats.Stats(profile, stream=out)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+        if after is not None:
+            out.write(f"Top {self.top} allocation sites (new memory)\n")
+            # leave out our own snapshot-taking
+            ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+            diff = after.filter_traces(ignore).compare_to(
+                before.filter_traces(ignore), "lineno"
+            )
+            for stat in diff[: self.top]:
+                out.write(f"{stat}\n")
+        with open(stem + ".txt", "w") as f:
+            f.write(out.getvalue())
+        self.last_report = stem + ".txt"
+
+
+def profiled(method):
+    """Run a method under self.profiler when the instance has one."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.profiler is None:
+            return method(self, *args, **kwargs)
+        return self.profiler.run(
+            method.__name__, method, self, *args, **kwargs
+        )
+
+    return wrapper
+
+
+def profiling_doctests():
+    """Function to run the doctests for the profiling hook.
+
+    Note that you should run this doctest at the root folder of the project
+    (same level as main.py)
+
+    >>> import tempfile
+    >>> from pos import POSSystem
+    >>> tmp = tempfile.TemporaryDirectory()
+    >>> Profiler.from_env({}) is None
+    True
+    >>> Profiler.from_env({'POS_PROFILE': '1'}).directory
+    'profiles'
+    >>> env = {'POS_PROFILE': tmp.name, 'POS_PROFILE_MEMORY': '1'}
+    >>> profiler = Profiler.from_env(env)
+    >>> profiler.directory == tmp.name, profiler.memory
+    (True, True)
+
+    >>> pos = POSSystem('db-data/inventory.csv', 'db-data/memberships.csv',
+    ...                 'db-data/coupons.csv', profiler=profiler)
+    >>> pos.process_barcodes('cart-data/scan_1_binary.txt')
+    >>> with open(profiler.last_report) as f:
+    ...     report = f.read()
+    >>> report.startswith('process_barcodes at ')
+    True
+    >>> 'ingest' in report, 'allocation sites' in report
+    (True, True)
+    >>> total = pos.checkout()
+    >>> sorted(name.split('-')[0] for name in os.listdir(tmp.name))
+    ['checkout', 'checkout', 'process_barcodes', 'process_barcodes']
+    >>> total > 0
+    True
+    >>> tracemalloc.is_tracing()
+    False
+    >>> tmp.cleanup()
+    """
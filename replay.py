@@ -0,0 +1,224 @@
+# replay.py
+
+import argparse
+import glob
+from concurrent.futures import ProcessPoolExecutor
+
+from barcode import DecodeCache
+from pos import POSSystem
+from scanfile import PackedScanReader, is_packed_scan_file
+from store_backend import StoreBackend
+
+
+# each worker process loads the store once and prices carts against the
+# starting stock
+_worker_store = None
+_worker_cache = None
+
+
+def _init_worker(
+    inventory_path: str, membership_path: str, coupon_path: str
+):
+    global _worker_store, _worker_cache
+    _worker_store = StoreBackend(inventory_path, membership_path, coupon_path)
+    _worker_cache = DecodeCache()
+
+
+def _price_transaction(scan_path: str) -> tuple:
+    """Decode and price one scan file against the starting stock.
+
+    Returns (scanned, quantities, member_barcode, coupon_barcodes,
+    total): the decoded barcodes in scan order, units per product
+    barcode in the cart, the member's barcode or None, the barcodes of
+    the cart's coupons, and the cart total.
+    """
+    pos = POSSystem(store=_worker_store, decode_cache=_worker_cache)
+    # the same two formats POSSystem.process_barcodes reads
+    if is_packed_scan_file(scan_path):
+        source = PackedScanReader(scan_path)
+    else:
+        source = open(scan_path, "r")
+    with source as scans:
+        scanned = [
+            r.numeric_barcode
+            for r in pos.ingest(scans)
+            if r.numeric_barcode is not None
+        ]
+    cart = pos.get_current_cart()
+    member = cart.get_membership()
+    result = (
+        scanned,
+        dict(cart.quantities),
+        member.get_barcode() if member else None,
+        [c.get_barcode() for c in cart.get_coupons()],
+        cart.calculate_total(),
+    )
+    # give the reserved units back so the next file sees the starting stock
+    pos.void_cart()
+    return result
+
+
+def replay(
+    store: StoreBackend, scan_paths: list, processes: int = None
+) -> list:
+    """Replay scan files as consecutive transactions, in list order, with
+    decoding and pricing spread over a process pool.
+
+    Workers price each cart against the starting stock. The results are
+    merged here in transaction order: a cart whose units all fit in the
+    stock left by the earlier transactions is exactly the cart a serial
+    run would build, so it is recorded as a sale as is (journaled, if
+    the store keeps a journal); any other cart is rebuilt from its
+    decoded barcodes against the current stock. Points are added in
+    transaction order so float totals match a serial run, and the CSVs
+    are saved once at the end.
+    Returns the total of every transaction.
+    """
+    paths = (store.inventory_path, store.membership_path, store.coupon_path)
+    totals = []
+    with ProcessPoolExecutor(
+        processes, initializer=_init_worker, initargs=paths
+    ) as pool:
+        results = pool.map(_price_transaction, scan_paths, chunksize=4)
+        for scanned, quantities, member_barcode, coupons, total in results:
+            if all(
+                q <= store.get_product(code).get_quantity()
+                for code, q in quantities.items()
+            ):
+                member, points = None, 0
+                if member_barcode is not None:
+                    member = store.get_member(member_barcode)
+                    points = total * member.get_points_multiplier()
+                store.record_sale(
+                    quantities,
+                    member,
+                    points,
+                    [store.get_coupon(code) for code in coupons],
+                    total,
+                )
+            else:
+                # stock ran short: rebuild the cart the way a serial run
+                # would, without decoding again
+                pos = POSSystem(store=store)
+                for numeric_barcode in scanned:
+                    pos.add_numeric_barcode(numeric_barcode)
+                total = pos.checkout(save=False)
+            totals.append(total)
+
+    store.save_inventory()
+    store.save_memberships()
+    return totals
+
+
+def replay_serial(store: StoreBackend, scan_paths: list) -> list:
+    """Reference replay on one lane, one scan file after another."""
+    pos = POSSystem(store=store)
+    totals = []
+    for path in scan_paths:
+        pos.process_barcodes(path)
+        totals.append(pos.checkout(save=False))
+        pos.new_cart()
+    store.save_inventory()
+    store.save_memberships()
+    return totals
+
+
+def replay_doctests():
+    """Function to run the doctests for the batch replay.
+
+    Note that you should run this doctest at the root folder of the project
+    (same level as main.py)
+
+    >>> import os, tempfile
+    >>> from workload import WorkloadGenerator
+    >>> from database import ProductDatabase, MemberDatabase
+    >>> tmp = tempfile.TemporaryDirectory()
+    >>> gen = WorkloadGenerator(
+    ...     seed=3, n_products=40, n_members=10, max_stock=30
+    ... )
+    >>> db = gen.write_store(tmp.name)
+    >>> carts = []
+    >>> for i in range(24):
+    ...     path = os.path.join(tmp.name, f'cart_{i}.txt')
+    ...     _ = gen.write_cart(path, 60, cart_index=i, distinct=8,
+    ...                        reversed_fraction=0.1, corrupt_fraction=0.05)
+    ...     carts.append(path)
+    >>> def saved():
+    ...     with open(ProductDatabase.SAVE_PATH) as f1:
+    ...         with open(MemberDatabase.SAVE_PATH) as f2:
+    ...             return f1.read(), f2.read()
+    >>> paths = (db['inventory'], db['memberships'], db['coupons'])
+    >>> serial_totals = replay_serial(StoreBackend(*paths), carts)
+    >>> serial_files = saved()
+    >>> store = StoreBackend(*paths)
+    >>> replay(store, carts, processes=3) == serial_totals
+    True
+    >>> saved() == serial_files
+    True
+    >>> sum(store.get_product(gen.barcode('product', i)).get_quantity() == 0
+    ...     for i in range(40)) > 0
+    True
+
+    Packed scan files replay the same as the text files they came from.
+
+    >>> from scanfile import convert_scan_file
+    >>> mixed = []
+    >>> for i, path in enumerate(carts):
+    ...     if i % 2:
+    ...         packed = path[:-len('.txt')] + '.upcb'
+    ...         _ = convert_scan_file(path, packed)
+    ...         path = packed
+    ...     mixed.append(path)
+    >>> replay(StoreBackend(*paths), mixed, processes=3) == serial_totals
+    True
+    >>> saved() == serial_files
+    True
+    >>> replay_serial(StoreBackend(*paths), mixed) == serial_totals
+    True
+
+    With a journal, every transaction is journaled and recovery gives
+    back the replayed store.
+
+    >>> from journal import TransactionJournal
+    >>> journal = TransactionJournal(os.path.join(tmp.name, 'journal'))
+    >>> journaled = StoreBackend(*paths, journal=journal)
+    >>> replay(journaled, carts, processes=3) == serial_totals
+    True
+    >>> len(list(journal.events())) == len(carts)
+    True
+    >>> def state(store):
+    ...     return (
+    ...         {c: p.get_quantity()
+    ...          for c, p in store.product_database.products.items()},
+    ...         {c: m.get_points()
+    ...          for c, m in store.member_database.members.items()},
+    ...     )
+    >>> journal.close()
+    >>> journal = TransactionJournal(os.path.join(tmp.name, 'journal'))
+    >>> state(StoreBackend(*paths, journal=journal)) == state(journaled)
+    True
+    >>> journal.close()
+    >>> tmp.cleanup()
+    """
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay archived scan files as one batch."
+    )
+    parser.add_argument("scan_glob", help="e.g. 'archive/2026-10-17/*.txt'")
+    parser.add_argument("--inventory", default="db-data/inventory.csv")
+    parser.add_argument("--memberships", default="db-data/memberships.csv")
+    parser.add_argument("--coupons", default="db-data/coupons.csv")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--serial", action="store_true")
+    args = parser.parse_args()
+
+    store = StoreBackend(args.inventory, args.memberships, args.coupons)
+    # transaction order is the sorted file order
+    scan_paths = sorted(glob.glob(args.scan_glob))
+    if args.serial:
+        totals = replay_serial(store, scan_paths)
+    else:
+        totals = replay(store, scan_paths, args.processes)
+    print(f"replayed {len(totals)} transactions, total {sum(totals):.2f}")
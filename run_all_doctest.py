@@ -13,6 +13,18 @@ def run_all_doctests():
         "store_backend.py",
         "cart.py",
         "pos.py",
+        "scanfile.py",
+        "workload.py",
+        "scanstream.py",
+        "lane_server.py",
+        "replay.py",
+        "persistence.py",
+        "journal.py",
+        "timing.py",
+        "profiling.py",
+        "bench.py",
+        "money.py",
+        "whatif.py",
     ]
 
     # Run doctests for each file
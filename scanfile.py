@@ -0,0 +1,176 @@
+# scanfile.py
+
+import mmap
+import struct
+import sys
+
+from barcode import BarcodeProcessor
+
+
+# header: magic, format version, bytes per record, reserved, record count
+MAGIC = b"UPCB"
+VERSION = 1
+RECORD_SIZE = 12
+HEADER = struct.Struct("<4sBBHQ")
+
+# a record with this bit set is a row that was not 95 bars/spaces; its
+# low byte holds the status decode_status gave the original text row
+UNREADABLE_FLAG = 1 << 95
+
+
+def pack_barcode(binary_barcode: str) -> bytes:
+    """Pack a 95-symbol binary barcode into a 12-byte big-endian record.
+
+    >>> pack_barcode('101' + '0' * 89 + '101').hex()
+    '500000000000000000000005'
+    >>> pack_barcode('10').hex()
+    '800000000000000000000001'
+    """
+    if (
+        len(binary_barcode) == 95
+        and binary_barcode.count("0") + binary_barcode.count("1") == 95
+    ):
+        return int(binary_barcode, 2).to_bytes(RECORD_SIZE, "big")
+    status, _ = BarcodeProcessor().decode_status(binary_barcode)
+    return (UNREADABLE_FLAG | status).to_bytes(RECORD_SIZE, "big")
+
+
+def unpack_barcode(bits: int) -> str:
+    """Return the binary string for a packed record, or '' if unreadable."""
+    if bits & UNREADABLE_FLAG:
+        return ""
+    return format(bits, "095b")
+
+
+def convert_scan_file(text_path: str, packed_path: str) -> int:
+    """Convert a text scan file (one binary barcode per line) to the
+    packed format. Returns the number of records written."""
+    count = 0
+    with open(text_path, "r") as src, open(packed_path, "wb") as dst:
+        dst.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE, 0, 0))
+        for line in src:
+            dst.write(pack_barcode(line.strip()))
+            count += 1
+        dst.seek(0)
+        dst.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE, 0, count))
+    return count
+
+
+def is_packed_scan_file(path: str) -> bool:
+    """Return whether the file at path starts with the packed-format magic."""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class PackedScanReader:
+    """
+    Memory-mapped reader for packed scan files. Iterating yields every
+    record as a 95-bit integer, ready for BarcodeProcessor.decode_packed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+        except ValueError:
+            # mmap refuses empty files
+            self._file.close()
+            raise ValueError("Not a packed scan file")
+        if len(self._map) < HEADER.size:
+            self.close()
+            raise ValueError("Not a packed scan file")
+        magic, version, record_size, _, count = HEADER.unpack_from(
+            self._map, 0
+        )
+        if (
+            magic != MAGIC
+            or version != VERSION
+            or record_size != RECORD_SIZE
+            or len(self._map) != HEADER.size + count * RECORD_SIZE
+        ):
+            self.close()
+            raise ValueError("Not a packed scan file")
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        data = self._map
+        from_bytes = int.from_bytes
+        for offset in range(
+            HEADER.size, HEADER.size + self.count * RECORD_SIZE, RECORD_SIZE
+        ):
+            yield from_bytes(data[offset : offset + RECORD_SIZE], "big")
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def scanfile_doctests():
+    """Function to run the doctests for the packed scan file format.
+
+    Note that you should run this doctest at the root folder of the project
+    (same level as main.py)
+
+    >>> import os, tempfile
+    >>> tmp = tempfile.TemporaryDirectory()
+    >>> packed = os.path.join(tmp.name, 'test_scan.upcb')
+    >>> convert_scan_file('cart-data/test_scan_binary.txt', packed)
+    994
+    >>> os.path.getsize(packed) == HEADER.size + 994 * RECORD_SIZE
+    True
+    >>> is_packed_scan_file(packed)
+    True
+    >>> is_packed_scan_file('cart-data/test_scan_binary.txt')
+    False
+    >>> with open('cart-data/test_scan_binary.txt', 'r') as f:
+    ...     rows = [line.strip() for line in f]
+    >>> with PackedScanReader(packed) as reader:
+    ...     records = list(reader)
+    >>> [unpack_barcode(bits) for bits in records] == rows
+    True
+    >>> bp = BarcodeProcessor()
+    >>> [bp.decode_packed(bits, check=True) for bits in records] == [
+    ...     bp.decode_status(row, check=True) for row in rows
+    ... ]
+    True
+    >>> bp.decode_packed(int.from_bytes(pack_barcode('1' * 94), 'big'))
+    (1, None)
+
+    >>> from pos import POSSystem
+    >>> pos = POSSystem(
+    ...     'db-data/inventory.csv',
+    ...     'db-data/memberships.csv',
+    ...     'db-data/coupons.csv'
+    ... )
+    >>> pos.process_barcodes(packed)
+    >>> items = pos.get_current_cart().get_items()
+    >>> [item.get_name() for item in items].count('Apple')
+    200
+    >>> pos.get_current_cart().get_membership().get_name()
+    'John Smith'
+
+    >>> PackedScanReader('cart-data/scan_1_binary.txt')
+    Traceback (most recent call last):
+    ...
+    ValueError: Not a packed scan file
+    >>> tmp.cleanup()
+    """
+
+
+if __name__ == "__main__":
+    # python scanfile.py cart-data/scan_1_binary.txt cart-data/scan_1.upcb
+    text_path, packed_path = sys.argv[1], sys.argv[2]
+    n = convert_scan_file(text_path, packed_path)
+    print(f"packed {n} barcodes into {packed_path}")
@@ -0,0 +1,84 @@
+# scanstream.py
+
+import queue
+import threading
+
+
+class ScanBuffer:
+    """
+    Bounded FIFO of raw scans between a scanner device and
+    POSSystem.ingest. put() blocks while the buffer is full, so a fast
+    device is held back instead of queueing scans without limit.
+    Iterating yields scans until close() has been called and the buffer
+    has drained.
+    """
+
+    _CLOSED = object()
+
+    def __init__(self, maxsize: int = 256):
+        if maxsize <= 0:
+            raise ValueError("Buffer size must be positive")
+        self._queue = queue.Queue(maxsize)
+        self._closed = False
+
+    def put(self, scan, timeout: float = None):
+        """Add a scan, waiting up to timeout seconds for room (forever if
+        None). Raises queue.Full if there is still no room."""
+        if self._closed:
+            raise ValueError("Scan buffer is closed")
+        self._queue.put(scan, timeout=timeout)
+
+    def close(self):
+        """Mark the end of the stream; waits for room for the marker."""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(ScanBuffer._CLOSED)
+
+    def __len__(self):
+        return self._queue.qsize()
+
+    def __iter__(self):
+        while True:
+            scan = self._queue.get()
+            if scan is ScanBuffer._CLOSED:
+                return
+            yield scan
+
+
+def pump(source, buffer: ScanBuffer) -> threading.Thread:
+    """Copy every scan from source (a device stream, file, pipe...) into
+    buffer on a background thread, then close the buffer. Returns the
+    started thread."""
+
+    def run():
+        try:
+            for scan in source:
+                buffer.put(scan)
+        finally:
+            buffer.close()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def scanstream_doctests():
+    """Function to run the doctests for the ScanBuffer class.
+
+    >>> buffer = ScanBuffer(maxsize=2)
+    >>> buffer.put('a'); buffer.put('b')
+    >>> buffer.put('c', timeout=0.01)
+    Traceback (most recent call last):
+    ...
+    queue.Full
+    >>> len(buffer)
+    2
+    >>> producer = pump(iter(['c', 'd']), buffer)
+    >>> list(buffer)
+    ['a', 'b', 'c', 'd']
+    >>> producer.join()
+    >>> buffer.put('e')
+    Traceback (most recent call last):
+    ...
+    ValueError: Scan buffer is closed
+    """
@@ -1,39 +1,341 @@
-from database import ProductDatabase, MemberDatabase, CouponDatabase
+import threading
+import time
+from time import perf_counter_ns
+
+from database import (
+    ProductDatabase,
+    MemberDatabase,
+    CouponDatabase,
+    copy_csv,
+)
 from product import Product
 from member import Member
 from coupon import Coupon
+from persistence import WriteBehindWriter
+from journal import TransactionJournal
+from timing import StageTimings
+
+
+class _Locked:
+    """Hold several locks for the duration of a with block."""
+
+    def __init__(self, locks: list):
+        self.locks = locks
+
+    def __enter__(self):
+        for lock in self.locks:
+            lock.acquire()
+
+    def __exit__(self, *exc):
+        for lock in reversed(self.locks):
+            lock.release()
 
 
 class StoreBackend:
+    """
+    Databases for one store. A single StoreBackend can be shared by many
+    POSSystem lanes running in threads: stock and points updates take a
+    per-barcode lock from a fixed pool of lock_shards locks, and units a
+    lane has scanned are reserved so no two lanes sell the last unit.
+
+    With write_behind, save_changes() only records that the stock or
+    points changed; a background writer saves both CSVs at most every
+    flush_interval seconds, or once flush_changes changes have piled up.
+
+    Each database is loaded when it is first used, so start-up only pays
+    for what the first transaction touches; prefetch loads the rest in a
+    background thread. load_times records what was loaded and how long
+    it took.
+    """
+
     def __init__(
-        self, inventory_path: str, membership_path: str, coupon_path: str
+        self,
+        inventory_path: str,
+        membership_path: str,
+        coupon_path: str,
+        lock_shards: int = 64,
+        write_behind: bool = False,
+        flush_interval: float = 1.0,
+        flush_changes: int = 100,
+        journal: TransactionJournal = None,
+        prefetch: bool = False,
     ):
-        self.product_database = ProductDatabase(inventory_path)
-        self.member_database = MemberDatabase(membership_path)
-        self.coupon_database = CouponDatabase(coupon_path)
+        self.inventory_path = inventory_path
+        self.membership_path = membership_path
+        self.coupon_path = coupon_path
+        self.journal = journal
+        # name -> database, filled in on first use
+        self._databases = {}
+        # name -> seconds its load took
+        self.load_times = {}
+        # a journal recovers products and members together
+        product_lock = threading.Lock()
+        self._load_locks = {
+            "products": product_lock,
+            "members": product_lock if journal else threading.Lock(),
+            "coupons": threading.Lock(),
+        }
+        self._locks = [threading.Lock() for _ in range(lock_shards)]
+        # barcode -> units held by open carts, guarded by the barcode's lock
+        self._reserved = {}
+        # the save files are shared, so only one lane writes at a time
+        self._save_lock = threading.Lock()
+        # sales reach the journal in the order they hit the databases, and
+        # a snapshot never sees a sale half applied
+        self._sale_lock = threading.Lock()
+        self.writer = None
+        if write_behind:
+            self.writer = WriteBehindWriter(
+                self._save_all, flush_interval, flush_changes
+            )
+        self.prefetch_thread = None
+        if prefetch:
+            self.prefetch_thread = threading.Thread(
+                target=self.load_all, daemon=True
+            )
+            self.prefetch_thread.start()
+
+    def _database(self, name: str):
+        database = self._databases.get(name)
+        if database is not None:
+            return database
+        with self._load_locks[name]:
+            # another lane (or the prefetch) may have loaded it meanwhile
+            if name not in self._databases:
+                start = time.perf_counter()
+                if name == "coupons":
+                    loaded = {"coupons": CouponDatabase(self.coupon_path)}
+                elif self.journal is not None:
+                    products, members = self.journal.recover(
+                        self.inventory_path, self.membership_path
+                    )
+                    loaded = {"products": products, "members": members}
+                elif name == "products":
+                    loaded = {"products": ProductDatabase(self.inventory_path)}
+                else:
+                    loaded = {"members": MemberDatabase(self.membership_path)}
+                seconds = time.perf_counter() - start
+                for key, database in loaded.items():
+                    self.load_times[key] = seconds
+                    self._databases[key] = database
+            return self._databases[name]
+
+    @property
+    def product_database(self) -> ProductDatabase:
+        return self._database("products")
+
+    @property
+    def member_database(self) -> MemberDatabase:
+        return self._database("members")
+
+    @property
+    def coupon_database(self) -> CouponDatabase:
+        return self._database("coupons")
+
+    def load_all(self):
+        """Load every database not loaded yet."""
+        for name in ("products", "members", "coupons"):
+            self._database(name)
+
+    def loaded(self) -> list:
+        """Names of the databases loaded so far."""
+        return [
+            name
+            for name in ("products", "members", "coupons")
+            if name in self._databases
+        ]
+
+    def _lock_for(self, numeric_barcode: str) -> threading.Lock:
+        return self._locks[hash(numeric_barcode) % len(self._locks)]
 
     def get_product(self, numeric_barcode: str) -> Product:
         return self.product_database.get_product(numeric_barcode)
 
     def decrease_product_quantity(self, product: Product, quantity: int):
-        self.product_database.decrement_inventory(
-            product.get_barcode(), quantity
-        )
+        code = product.get_barcode()
+        with self._lock_for(code):
+            self.product_database.decrement_inventory(code, quantity)
+
+    def decrease_product_quantities(self, quantities: dict):
+        """Decrement stock for a whole barcode -> quantity mapping as one
+        operation (a remote backend would make it one round trip)."""
+        with _Locked(self._locks_for(quantities)):
+            self.product_database.decrement_inventory_many(quantities)
+
+    def _locks_for(self, numeric_barcodes) -> list:
+        # always taken in pool order, so two bulk updates cannot deadlock
+        shards = {hash(code) % len(self._locks) for code in numeric_barcodes}
+        return [self._locks[i] for i in sorted(shards)]
+
+    def reserve_product(self, product: Product, quantity: int = 1) -> bool:
+        """Hold quantity units for a cart if that many are still unheld.
+        Returns whether the units were reserved."""
+        code = product.get_barcode()
+        with self._lock_for(code):
+            reserved = self._reserved.get(code, 0)
+            if product.get_quantity() - reserved < quantity:
+                return False
+            self._reserved[code] = reserved + quantity
+            return True
+
+    def release_product(self, product: Product, quantity: int = 1):
+        """Give back units reserved by a cart that was not checked out."""
+        code = product.get_barcode()
+        with self._lock_for(code):
+            self._release(code, quantity)
+
+    def commit_product(self, product: Product, quantity: int = 1):
+        """Sell reserved units: decrement the inventory and drop the
+        reservation in one step."""
+        code = product.get_barcode()
+        with self._lock_for(code):
+            self.product_database.decrement_inventory(code, quantity)
+            self._release(code, quantity)
+
+    def commit_products(self, quantities: dict):
+        """Bulk commit_product for a barcode -> quantity mapping, e.g. a
+        cart's quantities at checkout."""
+        with _Locked(self._locks_for(quantities)):
+            self.product_database.decrement_inventory_many(quantities)
+            for code, quantity in quantities.items():
+                self._release(code, quantity)
+
+    def release_products(self, quantities: dict):
+        """Bulk release_product for a barcode -> quantity mapping."""
+        with _Locked(self._locks_for(quantities)):
+            for code, quantity in quantities.items():
+                self._release(code, quantity)
+
+    def _release(self, code: str, quantity: int):
+        reserved = self._reserved.get(code, 0) - quantity
+        if reserved > 0:
+            self._reserved[code] = reserved
+        else:
+            self._reserved.pop(code, None)
+
+    def get_reserved(self, numeric_barcode: str) -> int:
+        return self._reserved.get(numeric_barcode, 0)
 
     def get_member(self, numeric_barcode: str):
         return self.member_database.get_member(numeric_barcode)
 
     def add_member_points(self, member: Member, points: int):
-        self.member_database.add_points(member.get_barcode(), points)
+        code = member.get_barcode()
+        with self._lock_for(code):
+            self.member_database.add_points(code, points)
+
+    def record_sale(
+        self,
+        quantities: dict,
+        member: Member = None,
+        points: float = 0,
+        coupons: list = (),
+        total: float = 0.0,
+        timings: StageTimings = None,
+    ):
+        """Apply a checkout: sell the cart's reserved units, add the
+        member's points and, with a journal, append the sale to it.
+        Each step is timed into timings if given."""
+        if self.journal is None:
+            self._apply_sale(quantities, member, points, timings)
+            return
+        with self._sale_lock:
+            start = self._apply_sale(quantities, member, points, timings)
+            self.journal.append(
+                quantities,
+                member.get_barcode() if member else None,
+                points,
+                [c.get_barcode() for c in coupons],
+                total,
+            )
+            if timings is not None:
+                timings.lap("journal_append", start)
+            if self.journal.compaction_due():
+                self.journal.compact(
+                    self.product_database, self.member_database
+                )
+
+    def _apply_sale(
+        self,
+        quantities: dict,
+        member: Member,
+        points: float,
+        timings: StageTimings,
+    ):
+        start = 0
+        if timings is not None:
+            start = perf_counter_ns()
+        self.commit_products(quantities)
+        if timings is not None:
+            start = timings.lap("inventory_update", start)
+        if member is not None:
+            self.add_member_points(member, points)
+            if timings is not None:
+                start = timings.lap("points_update", start)
+        return start
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot."""
+        if self.journal is not None:
+            with self._sale_lock:
+                self.journal.compact(
+                    self.product_database, self.member_database
+                )
 
     def get_coupon(self, numeric_barcode: str):
         return self.coupon_database.get_coupon(numeric_barcode)
 
+    def _unloaded(self, name: str) -> bool:
+        # without a journal, a database that was never loaded is exactly
+        # its source CSV; with one, its state is what recover() rebuilds
+        return name not in self._databases and self.journal is None
+
     def save_inventory(self):
-        self.product_database.save_inventory()
+        with self._save_lock:
+            if self._unloaded("products"):
+                copy_csv(self.inventory_path, ProductDatabase.SAVE_PATH)
+            else:
+                self.product_database.save_inventory()
 
     def save_memberships(self):
-        self.member_database.save_memberships()
+        with self._save_lock:
+            if self._unloaded("members"):
+                copy_csv(self.membership_path, MemberDatabase.SAVE_PATH)
+            else:
+                self.member_database.save_memberships()
+
+    def _save_all(self):
+        self.save_inventory()
+        self.save_memberships()
+
+    def save_changes(self, timings: StageTimings = None):
+        """Persist a finished transaction: saves both CSVs now (copying
+        the source of a database that was never loaded), or leaves it to
+        the background writer when write_behind is on. Synchronous saves
+        are timed into timings if given."""
+        if self.writer is not None:
+            self.writer.mark_dirty()
+        elif timings is None:
+            self._save_all()
+        else:
+            start = perf_counter_ns()
+            self.save_inventory()
+            start = timings.lap("save_inventory", start)
+            self.save_memberships()
+            timings.lap("save_memberships", start)
+
+    def flush(self):
+        """Write any changes the background writer is still holding."""
+        if self.writer is not None:
+            self.writer.flush()
+
+    def close(self):
+        """Stop the background writer after a final flush, and sync and
+        close the journal."""
+        if self.writer is not None:
+            self.writer.close()
+        if self.journal is not None:
+            self.journal.close()
 
 
 def store_backend_doctests():
@@ -68,4 +370,81 @@ def store_backend_doctests():
     >>> store_backend.add_member_points(jane, 100)
     >>> jane.get_points() == 1300
     True
+
+    >>> wagyu = store_backend.get_product('014643206491')
+    >>> store_backend.reserve_product(wagyu)
+    True
+    >>> store_backend.reserve_product(wagyu)
+    False
+    >>> store_backend.release_product(wagyu)
+    >>> store_backend.reserve_product(wagyu)
+    True
+    >>> store_backend.commit_product(wagyu)
+    >>> wagyu.get_quantity(), store_backend.get_reserved('014643206491')
+    (0, 0)
+    >>> store_backend.reserve_product(wagyu)
+    False
+
+    >>> bread = store_backend.get_product('034149633942')
+    >>> store_backend.decrease_product_quantities(
+    ...     {'034149633942': 30, '012345678905': 40})
+    >>> bread.get_quantity(), milk.get_quantity()
+    (50, 100)
+    >>> store_backend.reserve_product(bread, 20)
+    True
+    >>> store_backend.commit_products({'034149633942': 15})
+    >>> bread.get_quantity(), store_backend.get_reserved('034149633942')
+    (35, 5)
+    >>> store_backend.release_products({'034149633942': 5})
+    >>> store_backend.get_reserved('034149633942')
+    0
+
+    >>> import threading
+    >>> apple = store_backend.get_product('027222235225')
+    >>> def lane():
+    ...     for _ in range(100):
+    ...         if store_backend.reserve_product(apple):
+    ...             store_backend.commit_product(apple)
+    >>> lanes = [threading.Thread(target=lane) for _ in range(4)]
+    >>> for t in lanes:
+    ...     t.start()
+    >>> for t in lanes:
+    ...     t.join()
+    >>> apple.get_quantity()
+    0
+
+    Databases load on first use: a cash sale never loads memberships or
+    coupons (its save copies the memberships CSV as is), and prefetch
+    loads everything in the background.
+
+    >>> import os, tempfile
+    >>> from pos import POSSystem
+    >>> tmp = tempfile.TemporaryDirectory()
+    >>> save_paths = ProductDatabase.SAVE_PATH, MemberDatabase.SAVE_PATH
+    >>> ProductDatabase.SAVE_PATH = os.path.join(tmp.name, 'inventory.csv')
+    >>> MemberDatabase.SAVE_PATH = os.path.join(tmp.name, 'memberships.csv')
+    >>> paths = ('db-data/inventory.csv', 'db-data/memberships.csv',
+    ...          'db-data/coupons.csv')
+    >>> lazy = StoreBackend(*paths)
+    >>> lazy.loaded()
+    []
+    >>> pos = POSSystem(store=lazy)
+    >>> pos.add_numeric_barcode('012345678905').kind
+    'item'
+    >>> pos.checkout()
+    2.99
+    >>> lazy.loaded(), list(lazy.load_times)
+    (['products'], ['products'])
+    >>> with open(MemberDatabase.SAVE_PATH) as saved:
+    ...     with open(paths[1]) as source:
+    ...         saved.read() == source.read()
+    True
+    >>> ProductDatabase.SAVE_PATH, MemberDatabase.SAVE_PATH = save_paths
+    >>> tmp.cleanup()
+    >>> prefetched = StoreBackend(*paths, prefetch=True)
+    >>> prefetched.prefetch_thread.join()
+    >>> prefetched.loaded()
+    ['products', 'members', 'coupons']
+    >>> prefetched.get_member(jane_barcode).get_points()
+    1200
     """
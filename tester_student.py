@@ -79,8 +79,7 @@ def barcode_digits2binary(barcode_12: str) -> str:
 
 def generate_barcode_12(item_type: str):
     """Given a item type (product, coupon, or membership), generate a barcode\
-        12. It's currently generatina a numeric barcode that is not valid.\
-        Update it to generate a valid numeric barcode.
+        12 whose last digit passes the modulo check.
 
     Args:
         item_type (str): The type of item to generate a barcode for.
@@ -109,10 +108,8 @@ def generate_barcode_12(item_type: str):
     rest_of_digits = "".join(random.choices(string.digits, k=10))
 
     first_11_digits = first_digit + rest_of_digits
-    # NOTE: last digit should be based modulo check if you want to generate a
-    # valid numeric barcode
-    last_digit = 3
-    # last_digit = generate_last_digit(first_11_digits)
+    # last digit is the modulo check digit, so the barcode is valid
+    last_digit = generate_last_digit(first_11_digits)
 
     return first_11_digits + str(last_digit)
 
@@ -126,8 +123,9 @@ def generate_last_digit(barcode_11: str) -> int:
     Returns:
         int: The last digit of the barcode.
     """
-    # OPTIONAL TODO
-    check_digit = 0
+    odd_sum = sum(int(barcode_11[i]) for i in range(0, 11, 2))
+    even_sum = sum(int(barcode_11[i]) for i in range(1, 11, 2))
+    check_digit = (10 - ((odd_sum * 3 + even_sum) % 10)) % 10
     return check_digit
 
 
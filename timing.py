@@ -0,0 +1,205 @@
+# timing.py
+
+from time import perf_counter_ns
+
+
+# stages of the scan -> checkout path, in the order they happen
+STAGES = (
+    "decode",
+    "identify",
+    "lookup",
+    "cart_add",
+    "calculate_total",
+    "inventory_update",
+    "points_update",
+    "journal_append",
+    "save_inventory",
+    "save_memberships",
+)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# each power of two is split into 2**_SUB_BITS buckets, so a reported
+# quantile is at most 1/8 above the true value
+_SUB_BITS = 3
+_LINEAR = 2 << _SUB_BITS
+
+
+def _bucket(ns: int) -> int:
+    if ns < _LINEAR:
+        return ns
+    shift = ns.bit_length() - _SUB_BITS - 1
+    return (shift << _SUB_BITS) + (ns >> shift)
+
+
+def _bucket_upper(index: int) -> int:
+    if index < _LINEAR:
+        return index
+    shift = (index >> _SUB_BITS) - 1
+    mantissa = index - (shift << _SUB_BITS)
+    return ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of durations in nanoseconds. Recording is a
+    couple of integer operations and a dict update; memory grows with
+    the number of distinct buckets hit, not the number of samples.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = {}
+
+    def record(self, ns: int):
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+        index = _bucket(ns)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def quantile(self, q: float) -> int:
+        """Return an upper bound on the q-quantile, in nanoseconds."""
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(_bucket_upper(index), self.max)
+        return self.max
+
+    def merge(self, other: "LatencyHistogram"):
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        for index, n in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + n
+
+
+class StageTimings:
+    """
+    One LatencyHistogram per stage of the scan -> checkout path. A
+    POSSystem given a StageTimings times every stage into it; with none
+    (the default) each stage costs one `is not None` test.
+
+    Not locked: give each lane its own StageTimings and merge() them to
+    report on a whole store.
+    """
+
+    def __init__(self):
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+
+    def record(self, stage: str, ns: int):
+        self.histograms[stage].record(ns)
+
+    def lap(self, stage: str, start: int) -> int:
+        """Record the time since start (from perf_counter_ns) against
+        stage. Returns the current time, the start of the next stage."""
+        now = perf_counter_ns()
+        self.histograms[stage].record(now - start)
+        return now
+
+    def merge(self, other: "StageTimings"):
+        for stage, histogram in other.histograms.items():
+            self.histograms[stage].merge(histogram)
+
+    def reset(self):
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+
+    def as_dict(self) -> dict:
+        """Return count, p50/p95/p99, max and mean in seconds for every
+        stage that recorded anything."""
+        report = {}
+        for stage, h in self.histograms.items():
+            if not h.count:
+                continue
+            report[stage] = {
+                "count": h.count,
+                "p50": h.quantile(0.5) / 1e9,
+                "p95": h.quantile(0.95) / 1e9,
+                "p99": h.quantile(0.99) / 1e9,
+                "max": h.max / 1e9,
+                "mean": h.total / h.count / 1e9,
+            }
+        return report
+
+    def exposition(self, name: str = "pos_stage_latency_seconds") -> str:
+        """Return the timings in the Prometheus text exposition format,
+        as a summary per stage plus a max gauge."""
+        lines = [f"# TYPE {name} summary"]
+        maxima = [f"# TYPE {name}_max gauge"]
+        for stage, h in self.histograms.items():
+            if not h.count:
+                continue
+            label = f'stage="{stage}"'
+            for q in QUANTILES:
+                lines.append(
+                    f'{name}{{{label},quantile="{q}"}} '
+                    f"{h.quantile(q) / 1e9:.9f}"
+                )
+            lines.append(f"{name}_sum{{{label}}} {h.total / 1e9:.9f}")
+            lines.append(f"{name}_count{{{label}}} {h.count}")
+            maxima.append(f"{name}_max{{{label}}} {h.max / 1e9:.9f}")
+        return "\n".join(lines + maxima) + "\n"
+
+
+def timing_doctests():
+    """Function to run the doctests for the latency histograms.
+
+    Note that you should run this doctest at the root folder of the project
+    (same level as main.py)
+
+    >>> h = LatencyHistogram()
+    >>> for ns in range(1, 1001):
+    ...     h.record(ns * 1000)
+    >>> h.count, h.max
+    (1000, 1000000)
+    >>> all(q * 1e6 <= h.quantile(q) <= q * 1e6 * 1.125
+    ...     for q in (0.5, 0.95, 0.99))
+    True
+    >>> h.quantile(1.0)
+    1000000
+    >>> LatencyHistogram().quantile(0.5)
+    0
+    >>> all(_bucket(_bucket_upper(i)) == i < _bucket(_bucket_upper(i) + 1)
+    ...     for i in range(_LINEAR, 200))
+    True
+
+    >>> t = StageTimings()
+    >>> t.record('decode', 2000)
+    >>> t.record('decode', 3000)
+    >>> t.as_dict()['decode']['count'], t.as_dict()['decode']['max']
+    (2, 3e-06)
+    >>> list(t.as_dict())
+    ['decode']
+    >>> print(t.exposition())
+    # TYPE pos_stage_latency_seconds summary
+    pos_stage_latency_seconds{stage="decode",quantile="0.5"} 0.000002047
+    pos_stage_latency_seconds{stage="decode",quantile="0.95"} 0.000003000
+    pos_stage_latency_seconds{stage="decode",quantile="0.99"} 0.000003000
+    pos_stage_latency_seconds_sum{stage="decode"} 0.000005000
+    pos_stage_latency_seconds_count{stage="decode"} 2
+    # TYPE pos_stage_latency_seconds_max gauge
+    pos_stage_latency_seconds_max{stage="decode"} 0.000003000
+    <BLANKLINE>
+
+    >>> from pos import POSSystem
+    >>> pos = POSSystem('db-data/inventory.csv', 'db-data/memberships.csv',
+    ...                 'db-data/coupons.csv', timings=StageTimings())
+    >>> pos.process_barcodes('cart-data/scan_1_binary.txt')
+    >>> _ = pos.checkout()
+    >>> report = pos.timings.as_dict()
+    >>> [stage for stage in STAGES if stage not in report]
+    ['journal_append']
+    >>> report['decode']['count'] == report['identify']['count'] > 0
+    True
+    >>> lane = StageTimings()
+    >>> lane.merge(pos.timings)
+    >>> lane.merge(pos.timings)
+    >>> lane.as_dict()['decode']['count'] == 2 * report['decode']['count']
+    True
+    """
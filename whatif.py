@@ -0,0 +1,229 @@
+# whatif.py
+
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:  # only the batch pricing needs NumPy
+    np = None
+
+from cart import _COMPENSATED_SUM
+from coupon import CouponRules, PERCENT, FIXED
+from member import SilverMember, GoldMember, PlatinumMember
+
+
+# tier codes used in the tiers column; 0 is a cart without a membership
+TIERS = ("", "Silver", "Gold", "Platinum")
+_TIER_CLASSES = {
+    "Silver": SilverMember,
+    "Gold": GoldMember,
+    "Platinum": PlatinumMember,
+}
+
+
+def cart_columns(carts, coupons) -> tuple:
+    """Turn ShoppingCarts into the columns price_carts takes: subtotals,
+    tier codes, and a carts x coupons matrix of which cart holds which
+    coupon (matched by barcode), as its scan position: 1 for the cart's
+    first coupon, 2 for the next, 0 where the cart doesn't hold it."""
+    column = {c.get_barcode(): j for j, c in enumerate(coupons)}
+    subtotals = np.empty(len(carts))
+    tiers = np.zeros(len(carts), dtype=np.int8)
+    held = np.zeros((len(carts), len(coupons)), dtype=np.int32)
+    for i, cart in enumerate(carts):
+        subtotals[i] = cart.calculate_subtotal()
+        member = cart.get_membership()
+        if member is not None:
+            tiers[i] = TIERS.index(member.return_membership_type())
+        for position, coupon in enumerate(cart.get_coupons(), 1):
+            held[i, column[coupon.get_barcode()]] = position
+    return subtotals, tiers, held
+
+
+def _sum_column(state, x, is_float, applies):
+    """Add x to the running sums where applies, per cart, the way
+    cart._RunningSum does: sum() of the coupon discounts bit for bit.
+    state is (total, compensation, float_seen); is_float says which
+    entries of x would be floats rather than ints."""
+    total, compensation, float_seen = state
+    if _COMPENSATED_SUM:
+        neumaier = applies & float_seen & is_float
+        t = total + x
+        compensation += np.where(
+            neumaier,
+            np.where(
+                np.abs(total) >= np.abs(x), (total - t) + x, (x - t) + total
+            ),
+            0.0,
+        )
+    total = np.where(applies, total + x, total)
+    float_seen = float_seen | (applies & is_float)
+    return total, compensation, float_seen
+
+
+def price_carts(
+    subtotals,
+    tiers,
+    held=None,
+    coupons=(),
+    now: datetime = None,
+    discount_rates: dict = None,
+    points_multipliers: dict = None,
+) -> dict:
+    """Price many carts at once with the rules of
+    ShoppingCart.calculate_total and POSSystem.checkout:
+      - each held, active coupon whose minimum the subtotal meets takes
+        subtotal * percent / 100, or its fixed value capped at the
+        subtotal, summed in each cart's scan order as sum() would
+        (compensated on Python 3.12+), so totals equal calculate_total
+        exactly
+      - the membership takes subtotal * its tier's discount rate
+      - total = subtotal - coupons - membership, but never below 0
+      - points = total * the tier's points multiplier
+
+    Args:
+        subtotals: cart subtotals.
+        tiers: tier code per cart, an index into TIERS (0: no member).
+        held: carts x coupons, nonzero where the cart has the coupon.
+            A cart's discounts are added in increasing order of these
+            values (ties in column order), e.g. cart_columns' scan
+            positions; plain bools add them in column order.
+        coupons: the Coupon of each held column; may include coupons
+            that were never issued, to see what they would have done.
+        now (datetime): clock for coupon expiry, datetime.now() if None.
+        discount_rates (dict): tier name -> discount rate overrides.
+        points_multipliers (dict): tier name -> multiplier overrides.
+
+    Returns:
+        dict: arrays coupon_discount, member_discount, total and points.
+    """
+    if np is None:
+        raise ImportError("price_carts requires numpy")
+    subtotals = np.asarray(subtotals, dtype=np.float64)
+    tiers = np.asarray(tiers)
+    rates = np.zeros(len(TIERS))
+    multipliers = np.zeros(len(TIERS))
+    for code, name in enumerate(TIERS[1:], 1):
+        member_class = _TIER_CLASSES[name]
+        rates[code] = (discount_rates or {}).get(
+            name, member_class.discount_rate
+        )
+        multipliers[code] = (points_multipliers or {}).get(
+            name, member_class.points_multiplier
+        )
+
+    n, m = len(subtotals), len(coupons)
+    if held is None:
+        held = np.zeros((n, m), dtype=bool)
+    held = np.asarray(held)
+    # expiry and rule compilation happen once per coupon, not per cart
+    rules = CouponRules(now=now)
+    amounts = np.zeros((n, m))
+    is_float = np.zeros((n, m), dtype=bool)
+    applies = np.zeros((n, m), dtype=bool)
+    for j, coupon in enumerate(coupons):
+        if not rules.add(coupon):
+            continue
+        kind, min_purchase, value = coupon.rule()
+        applies[:, j] = (held[:, j] != 0) & (subtotals >= min_purchase)
+        if kind == PERCENT:
+            amounts[:, j] = subtotals * value / 100
+            is_float[:, j] = True
+        elif kind == FIXED:
+            uncapped = subtotals - value > 0
+            amounts[:, j] = np.where(uncapped, value, subtotals)
+            # an int fixed value stays an int unless capped
+            is_float[:, j] = ~uncapped | isinstance(value, float)
+        else:
+            raise ValueError("Coupon has no compiled rule")
+
+    # float addition depends on order, so each cart adds its discounts
+    # in its own order: step k adds every cart's k-th coupon
+    order = np.argsort(
+        np.where(held != 0, held, np.inf), axis=1, kind="stable"
+    )
+    rows = np.arange(n)
+    steps = int((held != 0).sum(axis=1).max()) if n and m else 0
+    state = np.zeros(n), np.zeros(n), np.zeros(n, dtype=bool)
+    for k in range(steps):
+        col = order[:, k]
+        state = _sum_column(
+            state,
+            amounts[rows, col],
+            is_float[rows, col],
+            applies[rows, col],
+        )
+    total, compensation, float_seen = state
+    coupon_discount = np.where(
+        float_seen & (compensation != 0) & np.isfinite(compensation),
+        total + compensation,
+        total,
+    )
+
+    member_discount = subtotals * rates[tiers]
+    total = subtotals - coupon_discount - member_discount
+    total = np.where(total >= 0, total, 0.0)
+    return {
+        "coupon_discount": coupon_discount,
+        "member_discount": member_discount,
+        "total": total,
+        "points": total * multipliers[tiers],
+    }
+
+
+def whatif_doctests():
+    """Function to run the doctests for the batch what-if pricing.
+
+    Note that you should run this doctest at the root folder of the project
+    (same level as main.py)
+
+    >>> import random
+    >>> from cart import ShoppingCart
+    >>> from coupon import PercentDiscountCoupon, FixedDiscountCoupon
+    >>> from product import Product
+    >>> now = datetime(2026, 1, 1)
+    >>> coupons = [
+    ...     PercentDiscountCoupon('1', datetime(2026, 7, 31), 30.0, '', 15.0),
+    ...     FixedDiscountCoupon('2', datetime(2026, 6, 15), 0, '', 5.0),
+    ...     FixedDiscountCoupon('3', datetime(2024, 5, 1), 10.0, '', 2.5),
+    ...     PercentDiscountCoupon('5', datetime(2026, 9, 1), 0, '', 12.5),
+    ...     FixedDiscountCoupon('6', datetime(2026, 9, 1), 0, '', 3),
+    ... ]
+    >>> members = [None, SilverMember('s', 'S', 0), GoldMember('g', 'G', 0),
+    ...            PlatinumMember('p', 'P', 0)]
+    >>> rng = random.Random(4)
+    >>> carts = []
+    >>> for _ in range(3000):
+    ...     cart = ShoppingCart(now=now)
+    ...     for _ in range(rng.randint(0, 12)):
+    ...         price = rng.randint(19, 2999) / 100
+    ...         cart.add_item(Product('x', 'x', price, 1))
+    ...     member = rng.choice(members)
+    ...     if member:
+    ...         cart.add_membership(member)
+    ...     for coupon in rng.sample(coupons, len(coupons)):
+    ...         if rng.random() < 0.4:
+    ...             cart.add_coupon(coupon)
+    ...     carts.append(cart)
+    >>> priced = price_carts(*cart_columns(carts, coupons), coupons, now)
+    >>> priced['total'].tolist() == [cart.calculate_total() for cart in carts]
+    True
+    >>> list(priced['points']) == [
+    ...     cart.calculate_points(cart.calculate_total()) for cart in carts]
+    True
+
+    What if Gold took 8% off and every cart had a new 20% coupon?
+
+    >>> new = PercentDiscountCoupon('4', datetime(2027, 1, 1), 0, '', 20)
+    >>> subtotals, tiers, held = cart_columns(carts, coupons)
+    >>> last = np.full((len(carts), 1), len(coupons) + 1)
+    >>> held = np.hstack([held, last])
+    >>> whatif = price_carts(subtotals, tiers, held, coupons + [new], now,
+    ...                      discount_rates={'Gold': 0.08})
+    >>> bool(whatif['total'].sum() < priced['total'].sum())
+    True
+    >>> gold = tiers == 2
+    >>> bool(np.allclose(whatif['member_discount'][gold],
+    ...                  subtotals[gold] * 0.08))
+    True
+    """
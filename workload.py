@@ -0,0 +1,283 @@
+# workload.py
+
+import argparse
+import os
+import random
+from datetime import date, timedelta
+
+from tester_student import barcode_digits2binary, generate_last_digit
+
+
+TIERS = ("Silver", "Gold", "Platinum")
+PREFIXES = {"product": "0", "coupon": "1", "membership": "2"}
+BODY_SPACE = 10**10  # ten free digits between the type prefix and check
+
+
+class WorkloadGenerator:
+    """
+    Builds valid store fixtures (inventory, memberships, coupons) and binary
+    scan files at any scale. Barcodes are computed from an item's index
+    instead of being kept in a list, and every file is written line by
+    line, so memory use does not grow with the fixture size. The same seed
+    always produces the same files.
+    """
+
+    def __init__(
+        self,
+        seed: int = 0,
+        n_products: int = 1000,
+        n_members: int = 500,
+        n_coupons: int = 20,
+        base_date: date = date(2027, 1, 1),
+        max_stock: int = 500,
+    ):
+        """
+        Args:
+            seed (int): seed for every random choice.
+            n_products (int): number of SKUs in the inventory.
+            n_members (int): number of members.
+            n_coupons (int): number of coupons.
+            base_date (date): coupons expire up to a year either side of it.
+            max_stock (int): largest quantity of a SKU in the inventory.
+        """
+        if max(n_products, n_members, n_coupons) > BODY_SPACE:
+            raise ValueError("Too many items for 12-digit barcodes")
+        self.seed = seed
+        self.n_products = n_products
+        self.n_members = n_members
+        self.n_coupons = n_coupons
+        self.base_date = base_date
+        self.max_stock = max_stock
+        # index -> 10-digit body via an affine permutation mod 10**10, so
+        # barcodes are unique and scattered without storing them
+        rng = self._rng("barcodes")
+        self._permutations = {}
+        for kind in PREFIXES:
+            multiplier = rng.randrange(1, BODY_SPACE)
+            while multiplier % 2 == 0 or multiplier % 5 == 0:
+                multiplier = rng.randrange(1, BODY_SPACE)
+            self._permutations[kind] = (multiplier, rng.randrange(BODY_SPACE))
+
+    def _rng(self, *name) -> random.Random:
+        """Independent stream per file, so output does not depend on the
+        order the files are generated in."""
+        return random.Random(":".join(str(p) for p in (self.seed,) + name))
+
+    def barcode(self, kind: str, index: int) -> str:
+        """Return the numeric barcode of the index-th item of a kind.
+
+        Args:
+            kind (str): product, coupon, or membership.
+            index (int): position of the item in its file.
+
+        Returns:
+            str: a valid 12-digit numeric barcode.
+        """
+        multiplier, offset = self._permutations[kind]
+        body = (multiplier * index + offset) % BODY_SPACE
+        first_11 = PREFIXES[kind] + format(body, "010d")
+        return first_11 + str(generate_last_digit(first_11))
+
+    def write_inventory(self, path: str) -> int:
+        """Write the inventory CSV. Returns the number of rows written."""
+        rng = self._rng("inventory")
+        stock, top = rng.randint, self.max_stock
+        with open(path, "w") as f:
+            f.write("numeric_barcode,name,price,quantity\n")
+            for i in range(self.n_products):
+                f.write(
+                    f"{self.barcode('product', i)},Item {i},"
+                    f"{rng.randint(19, 9999) / 100:.2f},"
+                    f"{0 if rng.random() < 0.05 else stock(1, top)}\n"
+                )
+        return self.n_products
+
+    def write_memberships(self, path: str) -> int:
+        """Write the memberships CSV. Returns the number of rows written."""
+        rng = self._rng("memberships")
+        with open(path, "w") as f:
+            f.write("numeric_barcode,name,tier,points\n")
+            for i in range(self.n_members):
+                f.write(
+                    f"{self.barcode('membership', i)},Member {i},"
+                    f"{rng.choice(TIERS)},{rng.randint(0, 10000)}\n"
+                )
+        return self.n_members
+
+    def write_coupons(self, path: str) -> int:
+        """Write the coupons CSV. Returns the number of rows written."""
+        rng = self._rng("coupons")
+        with open(path, "w") as f:
+            f.write(
+                "numeric_barcode,expiration_date,discount_type,"
+                "discount_value,min_purchase,description\n"
+            )
+            for i in range(self.n_coupons):
+                expires = self.base_date + timedelta(rng.randint(-365, 365))
+                min_purchase = rng.choice((0, 10, 20, 30, 50))
+                if rng.random() < 0.5:
+                    value = rng.choice((5, 10, 15, 20))
+                    kind, description = "percent", f"{value}% off"
+                else:
+                    value = rng.choice((1, 2, 5, 10))
+                    kind, description = "fixed", f"${value} off"
+                f.write(
+                    f"{self.barcode('coupon', i)},{expires.isoformat()},"
+                    f"{kind},{value:.2f},{min_purchase:.2f},"
+                    f"{description} over ${min_purchase}\n"
+                )
+        return self.n_coupons
+
+    def write_cart(
+        self,
+        path: str,
+        n_scans: int,
+        cart_index: int = 0,
+        distinct: int = 50,
+        n_coupons: int = 1,
+        member: bool = True,
+        reversed_fraction: float = 0.0,
+        corrupt_fraction: float = 0.0,
+    ) -> int:
+        """Write one binary scan file.
+
+        Args:
+            path (str): where to write the scan file.
+            n_scans (int): number of product scans.
+            cart_index (int): carts with different indexes differ.
+            distinct (int): number of distinct SKUs the cart draws from.
+            n_coupons (int): coupon scans at the start of the cart.
+            member (bool): whether a membership card is scanned first.
+            reversed_fraction (float): share of scans read upside down.
+            corrupt_fraction (float): share of scans with flipped bars.
+
+        Returns:
+            int: the number of lines written.
+        """
+        rng = self._rng("cart", cart_index)
+        skus = [
+            rng.randrange(self.n_products)
+            for _ in range(min(distinct, self.n_products))
+        ]
+        scans = []
+        if member and self.n_members:
+            scans.append(("membership", rng.randrange(self.n_members)))
+        if self.n_coupons:
+            scans.extend(
+                ("coupon", rng.randrange(self.n_coupons))
+                for _ in range(n_coupons)
+            )
+        lines = 0
+        with open(path, "w") as f:
+            for i in range(len(scans) + n_scans):
+                if i < len(scans):
+                    kind, index = scans[i]
+                else:
+                    kind, index = "product", rng.choice(skus)
+                binary = barcode_digits2binary(self.barcode(kind, index))
+                roll = rng.random()
+                if roll < corrupt_fraction:
+                    binary = self._corrupt(binary, rng)
+                elif roll < corrupt_fraction + reversed_fraction:
+                    binary = binary[::-1]
+                f.write(("\n" if lines else "") + binary)
+                lines += 1
+        return lines
+
+    def _corrupt(self, binary: str, rng: random.Random) -> str:
+        """Flip one or two bars inside the data modules."""
+        bars = list(binary)
+        for _ in range(rng.randint(1, 2)):
+            i = rng.choice((rng.randrange(3, 45), rng.randrange(50, 92)))
+            bars[i] = "1" if bars[i] == "0" else "0"
+        return "".join(bars)
+
+    def write_store(self, directory: str) -> dict:
+        """Write inventory.csv, memberships.csv and coupons.csv into a
+        directory. Returns the three paths by name."""
+        os.makedirs(directory, exist_ok=True)
+        paths = {
+            name: os.path.join(directory, f"{name}.csv")
+            for name in ("inventory", "memberships", "coupons")
+        }
+        self.write_inventory(paths["inventory"])
+        self.write_memberships(paths["memberships"])
+        self.write_coupons(paths["coupons"])
+        return paths
+
+
+def workload_doctests():
+    """Function to run the doctests for the WorkloadGenerator class.
+
+    Note that you should run this doctest at the root folder of the project
+    (same level as main.py)
+
+    >>> import filecmp, tempfile
+    >>> from database import ProductDatabase, MemberDatabase, CouponDatabase
+    >>> from barcode import BarcodeProcessor
+    >>> tmp = tempfile.TemporaryDirectory()
+    >>> gen = WorkloadGenerator(seed=7, n_products=300, n_members=40)
+    >>> paths = gen.write_store(os.path.join(tmp.name, 'a'))
+    >>> len(ProductDatabase(paths['inventory']).products)
+    300
+    >>> len(MemberDatabase(paths['memberships']).members)
+    40
+    >>> len(CouponDatabase(paths['coupons']).coupons)
+    20
+    >>> bp = BarcodeProcessor()
+    >>> all(bp.check_digit_ok(gen.barcode('product', i)) for i in range(300))
+    True
+
+    >>> cart = os.path.join(tmp.name, 'cart.txt')
+    >>> mix = dict(reversed_fraction=0.2, corrupt_fraction=0.1)
+    >>> gen.write_cart(cart, 500, **mix)
+    502
+    >>> with open(cart) as f:
+    ...     results = [bp.decode_oriented(r.strip(), check=True) for r in f]
+    >>> sum(r[2] == 'reversed' for r in results) > 50
+    True
+    >>> 0 < sum(r[1] is None for r in results) < 100
+    True
+
+    >>> again = WorkloadGenerator(seed=7, n_products=300, n_members=40)
+    >>> paths_b = again.write_store(os.path.join(tmp.name, 'b'))
+    >>> all(filecmp.cmp(paths[k], paths_b[k], shallow=False) for k in paths)
+    True
+    >>> cart_b = os.path.join(tmp.name, 'cart_b.txt')
+    >>> again.write_cart(cart_b, 500, **mix)
+    502
+    >>> filecmp.cmp(cart, cart_b, shallow=False)
+    True
+    >>> tmp.cleanup()
+    """
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic store and binary scan carts."
+    )
+    parser.add_argument("directory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--members", type=int, default=500)
+    parser.add_argument("--coupons", type=int, default=20)
+    parser.add_argument("--carts", type=int, default=1)
+    parser.add_argument("--scans", type=int, default=100)
+    parser.add_argument("--distinct", type=int, default=50)
+    parser.add_argument("--reversed", type=float, default=0.0)
+    parser.add_argument("--corrupt", type=float, default=0.0)
+    args = parser.parse_args()
+
+    gen = WorkloadGenerator(
+        args.seed, args.products, args.members, args.coupons
+    )
+    gen.write_store(args.directory)
+    for i in range(args.carts):
+        gen.write_cart(
+            os.path.join(args.directory, f"cart_{i}_binary.txt"),
+            args.scans,
+            cart_index=i,
+            distinct=args.distinct,
+            reversed_fraction=args.reversed,
+            corrupt_fraction=args.corrupt,
+        )